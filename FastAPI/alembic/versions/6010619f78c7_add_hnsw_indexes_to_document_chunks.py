@@ -0,0 +1,43 @@
+"""add_hnsw_indexes_to_document_chunks
+
+Revision ID: 6010619f78c7
+Revises: 8c5add0dd1a8
+Create Date: 2026-10-15 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6010619f78c7'
+down_revision: Union[str, None] = '8c5add0dd1a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # HNSW indexes for approximate nearest-neighbour search (cosine distance)
+    op.create_index(
+        'ix_document_chunks_embedding_hnsw',
+        'document_chunks',
+        ['embedding'],
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'embedding': 'vector_cosine_ops'}
+    )
+    op.create_index(
+        'ix_document_chunks_possibly_question_embedding_hnsw',
+        'document_chunks',
+        ['possibly_question_embedding'],
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'possibly_question_embedding': 'vector_cosine_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_chunks_possibly_question_embedding_hnsw', table_name='document_chunks')
+    op.drop_index('ix_document_chunks_embedding_hnsw', table_name='document_chunks')
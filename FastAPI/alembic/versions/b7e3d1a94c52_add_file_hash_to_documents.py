@@ -0,0 +1,28 @@
+"""add_file_hash_to_documents
+
+Revision ID: b7e3d1a94c52
+Revises: 6010619f78c7
+Create Date: 2026-10-15 10:03:27.584113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3d1a94c52'
+down_revision: Union[str, None] = '6010619f78c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('file_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_documents_file_hash'), 'documents', ['file_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_documents_file_hash'), table_name='documents')
+    op.drop_column('documents', 'file_hash')
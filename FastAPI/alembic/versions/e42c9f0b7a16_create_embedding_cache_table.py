@@ -0,0 +1,33 @@
+"""create_embedding_cache_table
+
+Revision ID: e42c9f0b7a16
+Revises: b7e3d1a94c52
+Create Date: 2026-10-15 10:41:09.127554
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e42c9f0b7a16'
+down_revision: Union[str, None] = 'b7e3d1a94c52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('embedding_cache',
+    sa.Column('content_hash', sa.LargeBinary(), nullable=False),
+    sa.Column('model', sa.String(length=255), nullable=False),
+    sa.Column('embedding', pgvector.sqlalchemy.vector.VECTOR(dim=768), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('content_hash', 'model')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('embedding_cache')
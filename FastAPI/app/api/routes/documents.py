@@ -1,10 +1,12 @@
 """API routes for document management."""
-from typing import Optional, List
+import asyncio
+from typing import Optional, List, Dict
 from fastapi import APIRouter, Depends, File, UploadFile, Query, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
-from app.database import get_db
+from app.config import get_settings
+from app.database import get_db, SessionLocal
 from app.models.document import Document, DocumentType
 from app.models.document_chunk import DocumentChunk
 from app.schemas.document import (
@@ -22,7 +24,9 @@ from app.services.document import (
 )
 from app.websockets import manager
 from fastapi import WebSocket
-from app.services.grobid import extract_header, extract_fulltext, extract_references
+from app.services.grobid import extract_header, extract_fulltext_async, extract_references_async
+
+settings = get_settings()
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
 
@@ -271,8 +275,7 @@ async def upload_documents_bulk(
     files: List[UploadFile] = File(...),
     type: DocumentTypeEnum = Query(default=DocumentTypeEnum.JOURNAL),
     is_private: bool = Query(default=False),
-    client_id: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    client_id: Optional[str] = Query(None)
 ):
     """
     Upload and process multiple PDF documents at once.
@@ -282,13 +285,19 @@ async def upload_documents_bulk(
     2. Processed by GROBID for metadata extraction
     3. Split into chunks with embeddings for semantic search
     
+    Up to DOCUMENT_PROCESSING_CONCURRENCY documents are processed at the same
+    time, so one document's GROBID extraction overlaps another's embedding.
+    
     Returns a list of results for each uploaded document.
     """
     doc_type = DocumentType(type.value)
-    results = []
     total_files = len(files)
+    semaphore = asyncio.Semaphore(settings.DOCUMENT_PROCESSING_CONCURRENCY)
+    # Latest progress (0-100) per file index; files run concurrently, so the
+    # overall value is their average rather than a sequential offset
+    file_progress: Dict[int, int] = {}
     
-    for index, file in enumerate(files):
+    async def process_file(index: int, file: UploadFile) -> dict:
         file_result = {
             "filename": file.filename,
             "status": "pending",
@@ -296,43 +305,52 @@ async def upload_documents_bulk(
             "error": None
         }
         
-        try:
-            async def progress_callback(progress: int, message: str):
-                if client_id:
-                    overall_progress = int(((index + (progress / 100)) / total_files) * 100)
-                    await manager.send_personal_message(
-                        {
-                            "status": "processing",
-                            "current_file": file.filename,
-                            "file_index": index + 1,
-                            "total_files": total_files,
-                            "file_progress": progress,
-                            "overall_progress": overall_progress,
-                            "message": message
-                        },
-                        client_id
-                    )
-            
-            document = await process_document(
-                file=file,
-                db=db,
-                document_type=doc_type,
-                is_private=is_private,
-                progress_callback=progress_callback
-            )
-            
-            chunk_count = db.query(func.count(DocumentChunk.id)).filter(
-                DocumentChunk.document_id == document.id
-            ).scalar() or 0
-            
-            file_result["status"] = "success"
-            file_result["document"] = _build_document_response(document, chunk_count)
-            
-        except Exception as e:
-            file_result["status"] = "error"
-            file_result["error"] = str(e)
+        async with semaphore:
+            # Each file gets its own session so documents can be processed side by side
+            file_db = SessionLocal()
+            try:
+                async def progress_callback(progress: int, message: str):
+                    file_progress[index] = max(file_progress.get(index, 0), progress)
+                    if client_id:
+                        overall_progress = int(sum(file_progress.values()) / total_files)
+                        await manager.send_personal_message(
+                            {
+                                "status": "processing",
+                                "current_file": file.filename,
+                                "file_index": index + 1,
+                                "total_files": total_files,
+                                "file_progress": progress,
+                                "overall_progress": overall_progress,
+                                "message": message
+                            },
+                            client_id
+                        )
+                
+                document = await process_document(
+                    file=file,
+                    db=file_db,
+                    document_type=doc_type,
+                    is_private=is_private,
+                    progress_callback=progress_callback
+                )
+                
+                chunk_count = file_db.query(func.count(DocumentChunk.id)).filter(
+                    DocumentChunk.document_id == document.id
+                ).scalar() or 0
+                
+                file_result["status"] = "success"
+                file_result["document"] = _build_document_response(document, chunk_count)
+                
+            except Exception as e:
+                file_result["status"] = "error"
+                file_result["error"] = str(e)
+            finally:
+                file_progress[index] = 100  # Done, successfully or not
+                file_db.close()
         
-        results.append(file_result)
+        return file_result
+    
+    results = await asyncio.gather(*(process_file(index, file) for index, file in enumerate(files)))
     
     if client_id:
         await manager.send_personal_message(
@@ -363,7 +381,7 @@ async def test_grobid_header(file: UploadFile = File(...)):
 @router.post("/test-grobid-full")
 async def test_grobid_full(file: UploadFile = File(...)):
     file_bytes = await file.read()
-    fulltext = extract_fulltext(file_bytes)
+    fulltext = await extract_fulltext_async(file_bytes)
     with open("grobid_fulltext_response.txt", "w", encoding="utf-8") as f:
         f.write("==grobid_fulltext_response \n")
         f.write(fulltext + "\n")
@@ -375,7 +393,7 @@ async def test_grobid_full(file: UploadFile = File(...)):
 @router.post("/test-grobid-references")
 async def test_grobid_references(file: UploadFile = File(...)):
     file_bytes = await file.read()
-    references = extract_references(file_bytes)
+    references = await extract_references_async(file_bytes)
     print(references)
     return {"references": references}
 
@@ -21,9 +21,18 @@ class Settings(BaseSettings):
     MINIO_BUCKET: str = "syntra-minio"
     MINIO_DOCUMENTS_BUCKET: str = "documents"
     MINIO_SECURE: bool = False
+    MINIO_PART_SIZE: int = 16 * 1024 * 1024  # Multipart upload part size (min 5MB)
+    MINIO_UPLOAD_CONCURRENCY: int = 4  # Parts uploaded in parallel
+    MINIO_MAX_CONNECTIONS: int = 32  # Connection pool size of the shared client
     
     # GROBID
     GROBID_URL: str = "http://localhost:8070"
+    GROBID_MAX_CONNECTIONS: int = 8  # Concurrent requests sent to GROBID
+    DEBUG_DUMP_FULLTEXT: bool = False  # Write GROBID responses to local files for debugging
+    
+    # Document processing
+    DOCUMENT_PROCESSING_CONCURRENCY: int = 3  # Bulk-upload documents processed at once
+    QUESTION_GENERATION_CONCURRENCY: int = 8  # LLM question-generation calls in flight per document
     
     # Ollama
     OLLAMA_BASE_URL: str = "http://localhost:11434"
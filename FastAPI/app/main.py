@@ -1,12 +1,14 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from app.api.routes import auth
 from app.api.routes import documents
 from app.api.routes import chats
 from app.database import engine, Base
 from app.services.minio import get_minio_client, ensure_bucket_exists
 from app.services.document import ensure_documents_bucket_exists
+from app.services.grobid import close_async_client
 
 
 @asynccontextmanager
@@ -26,15 +28,16 @@ async def lifespan(app: FastAPI):
     
     yield
     
-    # Shutdown: cleanup if needed
-    pass
+    # Shutdown: close pooled GROBID connections
+    await close_async_client()
 
 
 app = FastAPI(
     title="RAG Journal Chatbot API",
     description="FastAPI backend for scientific journal storage and RAG-based chatbot using GROBID, MinIO, PostgreSQL/pgvector, and Ollama",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS Middleware
@@ -3,8 +3,9 @@ from app.models.user import User
 from app.models.document import Document, DocumentType
 from app.models.document_chunk import DocumentChunk, ChunkType
 from app.models.chat import Conversation, Chat, ChatReference, ChatRole
+from app.models.embedding_cache import EmbeddingCache
 
 __all__ = [
     "User", "Document", "DocumentType", "DocumentChunk", "ChunkType",
-    "Conversation", "Chat", "ChatReference", "ChatRole"
+    "Conversation", "Chat", "ChatReference", "ChatRole", "EmbeddingCache"
 ]
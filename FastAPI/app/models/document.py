@@ -47,6 +47,7 @@ class Document(Base):
     
     # File storage
     file_path = Column(Text)  # MinIO object name
+    file_hash = Column(String(64), index=True, nullable=True)  # blake2b hex digest of PDF content
     
     # Status flags
     is_private = Column(Boolean, default=False)
@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, String, Text, DateTime, ForeignKey, Enum
+    Column, Integer, String, Text, DateTime, ForeignKey, Enum, Index
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
@@ -22,6 +22,23 @@ class DocumentChunk(Base):
     """Document chunk model with vector embedding for semantic search."""
     
     __tablename__ = "document_chunks"
+    __table_args__ = (
+        # HNSW indexes for approximate nearest-neighbour search (cosine distance)
+        Index(
+            "ix_document_chunks_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+        Index(
+            "ix_document_chunks_possibly_question_embedding_hnsw",
+            "possibly_question_embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"possibly_question_embedding": "vector_cosine_ops"},
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     document_id = Column(
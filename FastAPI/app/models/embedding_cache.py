@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, LargeBinary, DateTime
+from sqlalchemy.sql import func
+from pgvector.sqlalchemy import Vector
+from app.database import Base
+
+
+class EmbeddingCache(Base):
+    """Persistent cache of text embeddings, keyed by content hash and model."""
+    
+    __tablename__ = "embedding_cache"
+    
+    content_hash = Column(LargeBinary, primary_key=True)  # blake2b digest of the text
+    model = Column(String(255), primary_key=True)  # Embedding model name
+    embedding = Column(Vector(768), nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<EmbeddingCache(model={self.model})>"
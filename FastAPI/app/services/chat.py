@@ -1,6 +1,8 @@
+import logging
+from functools import lru_cache
 from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func, extract, or_, case, literal
+from sqlalchemy import desc, func, extract, or_, case, literal, text, insert, select, union_all
 from fastapi import HTTPException
 import re
 
@@ -11,6 +13,77 @@ from app.services.llm import generate_response
 from app.services.embedding import generate_embedding
 from app.models.document import Document, DocumentType
 
+logger = logging.getLogger(__name__)
+
+# HNSW search breadth (pgvector default is 40); higher = better recall, slower
+HNSW_EF_SEARCH = 40
+# Metadata filters are applied after the HNSW scan; iterative scans (pgvector
+# >= 0.8) keep walking the index until enough filtered rows are found, instead
+# of stopping at the ef_search nearest neighbours. strict_order keeps results
+# in exact distance order, which the per-branch LIMIT relies on.
+HNSW_ITERATIVE_SCAN = "strict_order"
+# Fewer metadata-matching chunks than this and retrieval falls back to unfiltered ones
+MIN_FILTERED_RESULTS = 2
+
+# Entity extraction patterns (free-text values following a trigger word)
+_YEAR_RE = re.compile(r'\b(19\d{2}|20\d{2})\b')
+_AUTHOR_PATTERNS = (
+    re.compile(r'(?:oleh|penulis|author|ditulis oleh|karya)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)', re.IGNORECASE),
+    re.compile(r'(?:oleh|penulis|author|ditulis oleh|karya)\s+([a-zA-Z]+(?:\s+[a-zA-Z]+){0,3})', re.IGNORECASE),
+)
+_AUTHOR_STOPWORDS = frozenset({'dan', 'di', 'yang', 'untuk', 'dari', 'pada', 'tahun', 'tentang'})
+_PUBLISHER_RE = re.compile(
+    r'(?:diterbitkan(?:\s+oleh)?|penerbit|published\s+by)\s+([a-zA-Z]+(?:\s+[a-zA-Z]+){0,4})',
+    re.IGNORECASE
+)
+_JOURNAL_RE = re.compile(
+    r'(?:jurnal|journal|majalah|di\s+jurnal|di\s+journal)\s+([a-zA-Z]+(?:\s+[a-zA-Z]+){0,4})',
+    re.IGNORECASE
+)
+_DOI_RE = re.compile(r'(10\.\d{4,}/[^\s]+)')
+
+# Fixed entity vocabularies, matched word-by-word in _scan_vocabularies()
+_TOKEN_RE = re.compile(r'\w+')
+_LANGUAGE_TRIGGERS = frozenset({'bahasa', 'berbahasa'})
+_LANGUAGES = {
+    'indonesia': 'id', 'indonesian': 'id',
+    'inggris': 'en', 'english': 'en',
+    'melayu': 'ms', 'arab': 'ar', 'jepang': 'ja', 'mandarin': 'zh'
+}
+_LOCATIONS = frozenset({
+    'indonesia', 'jawa', 'sumatera', 'kalimantan', 'sulawesi', 'bali', 'papua',
+    'jakarta', 'bandung', 'surabaya', 'medan', 'yogyakarta', 'semarang', 'malang',
+    'asia', 'eropa', 'amerika', 'afrika', 'australia'
+})
+_DOC_TYPES = {
+    'thesis': DocumentType.THESIS, 'tesis': DocumentType.THESIS,
+    'skripsi': DocumentType.THESIS, 'disertasi': DocumentType.THESIS,
+    'conference': DocumentType.CONFERENCE, 'konferensi': DocumentType.CONFERENCE,
+    'seminar': DocumentType.CONFERENCE, 'prosiding': DocumentType.CONFERENCE,
+    'buku': DocumentType.BOOK, 'book': DocumentType.BOOK,
+    'laporan': DocumentType.REPORT, 'report': DocumentType.REPORT,
+    'jurnal': DocumentType.JOURNAL, 'journal': DocumentType.JOURNAL,
+    'artikel': DocumentType.JOURNAL,
+}
+_DOC_TYPE_PRIORITY = {
+    DocumentType.THESIS: 0,
+    DocumentType.CONFERENCE: 1,
+    DocumentType.BOOK: 2,
+    DocumentType.REPORT: 3,
+    DocumentType.JOURNAL: 4,
+}
+
+# Query words that carry no search meaning (Indonesian + entity trigger words)
+_STOPWORDS = frozenset({
+    'di', 'dan', 'yang', 'untuk', 'dengan', 'dari', 'ke', 'ini', 'itu',
+    'adalah', 'pada', 'dalam', 'oleh', 'akan', 'atau', 'juga', 'sudah',
+    'ada', 'bisa', 'dapat', 'saya', 'apa', 'bagaimana', 'mengapa', 'kapan',
+    'tentang', 'mengenai', 'terkait', 'seputar', 'informasi', 'jelaskan',
+    'hasil', 'penelitian', 'penulis', 'author', 'bahasa', 'berbahasa',
+    'tahun', 'diterbitkan', 'penerbit', 'jurnal', 'journal',
+    'karya', 'ditulis', 'published'
+})
+
 class ChatService:
     def __init__(self, db: Session):
         self.db = db
@@ -44,14 +117,21 @@ class ChatService:
             title = " ".join(request.message.split()[:5])
             return self.create_conversation(user_id, title)
 
-    def _save_chat_message(self, conversation_id: int, role: ChatRole, message: str) -> Chat:
-        """Save a chat message to the database."""
+    def _save_chat_message(self, conversation_id: int, role: ChatRole, message: str, commit: bool = True) -> Chat:
+        """
+        Save a chat message to the database.
+        With commit=False the message is only flushed (id assigned) so the
+        caller can add related rows and commit them in the same transaction.
+        """
         chat_msg = Chat(
             conversation_id=conversation_id,
             role=role,
             message=message
         )
         self.db.add(chat_msg)
+        if not commit:
+            self.db.flush()
+            return chat_msg
         self.db.commit()
         self.db.refresh(chat_msg)
         return chat_msg
@@ -71,32 +151,42 @@ class ChatService:
                 "keywords": [str]
             }
         """
+        result = self._analyze_query(query)
+        
+        print("========== QUERY PROCESSING ==========")
+        print(f"  Original : {query}")
+        print(f"  Cleaned  : {result['cleaned_query']}")
+        print(f"  Entities : {result['entities']}")
+        print(f"  Keywords : {result['keywords']}")
+        print("=======================================")
+        
+        return result
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _analyze_query(query: str) -> Dict[str, Any]:
+        """
+        Deterministic part of _process_query, memoized on the raw query text.
+        The returned dict is shared between callers and must not be mutated.
+        """
         # Step 1: Clean query
-        cleaned = self._clean_query(query)
+        cleaned = ChatService._clean_query(query)
         
         # Step 2: Extract entities mapped to Dublin Core
-        entities = self._extract_entities(query)
+        entities = ChatService._extract_entities(query)
         
         # Step 3: Extract keywords (excluding entity values already captured)
-        keywords = self._extract_keywords(cleaned, entities)
+        keywords = ChatService._extract_keywords(cleaned, entities)
         
-        result = {
+        return {
             "original_query": query,
             "cleaned_query": cleaned,
             "entities": entities,
             "keywords": keywords
         }
-        
-        print("========== QUERY PROCESSING ==========")
-        print(f"  Original : {query}")
-        print(f"  Cleaned  : {cleaned}")
-        print(f"  Entities : {entities}")
-        print(f"  Keywords : {keywords}")
-        print("=======================================")
-        
-        return result
 
-    def _clean_query(self, query: str) -> str:
+    @staticmethod
+    def _clean_query(query: str) -> str:
         """Clean and normalize the query text."""
         # Lowercase
         cleaned = query.lower().strip()
@@ -106,9 +196,11 @@ class ChatService:
         cleaned = re.sub(r'\s+', ' ', cleaned)
         return cleaned
 
-    def _extract_entities(self, query: str) -> Dict[str, Any]:
+    @staticmethod
+    def _extract_entities(query: str) -> Dict[str, Any]:
         """
-        Extract Dublin Core-mapped entities from query using regex patterns.
+        Extract Dublin Core-mapped entities from query using regex patterns
+        and fixed vocabularies.
         
         Mappings:
             year        → Document.date
@@ -121,107 +213,89 @@ class ChatService:
             doc_type    → Document.type
             topic       → used for semantic search (not a hard filter)
         """
-        query_lower = query.lower()
         entities = {}
         
+        # Fixed vocabularies (language, location, document type) in one token pass
+        language, location, doc_type = ChatService._scan_vocabularies(query)
+        
         # 1. Year (4-digit number 1900-2099)
-        year_match = re.search(r'\b(19\d{2}|20\d{2})\b', query)
+        year_match = _YEAR_RE.search(query)
         if year_match:
             entities["year"] = int(year_match.group(1))
         
         # 2. Creator/Author - patterns: "oleh X", "penulis X", "author X", "ditulis oleh X"
-        author_patterns = [
-            r'(?:oleh|penulis|author|ditulis oleh|karya)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-            r'(?:oleh|penulis|author|ditulis oleh|karya)\s+([a-zA-Z]+(?:\s+[a-zA-Z]+){0,3})',
-        ]
-        for pattern in author_patterns:
-            author_match = re.search(pattern, query, re.IGNORECASE)
+        for pattern in _AUTHOR_PATTERNS:
+            author_match = pattern.search(query)
             if author_match:
                 author_name = author_match.group(1).strip()
                 # Filter out stopwords that might be captured
-                stopwords = {'dan', 'di', 'yang', 'untuk', 'dari', 'pada', 'tahun', 'tentang'}
-                name_words = [w for w in author_name.split() if w.lower() not in stopwords]
+                name_words = [w for w in author_name.split() if w.lower() not in _AUTHOR_STOPWORDS]
                 if name_words:
                     entities["creator"] = " ".join(name_words)
                 break
         
         # 3. Language - patterns: "bahasa X", "berbahasa X", "dalam bahasa X"
-        lang_patterns = {
-            r'(?:bahasa|berbahasa|dalam bahasa)\s+(indonesia|inggris|english|indonesian|melayu|arab|jepang|mandarin)': {
-                'indonesia': 'id', 'indonesian': 'id',
-                'inggris': 'en', 'english': 'en',
-                'melayu': 'ms', 'arab': 'ar', 'jepang': 'ja', 'mandarin': 'zh'
-            }
-        }
-        for pattern, lang_map in lang_patterns.items():
-            lang_match = re.search(pattern, query_lower)
-            if lang_match:
-                lang_name = lang_match.group(1)
-                entities["language"] = lang_map.get(lang_name, lang_name)
-                break
+        if language:
+            entities["language"] = language
         
         # 4. Publisher - patterns: "diterbitkan X", "penerbit X", "published by X"
-        publisher_match = re.search(
-            r'(?:diterbitkan(?:\s+oleh)?|penerbit|published\s+by)\s+([a-zA-Z]+(?:\s+[a-zA-Z]+){0,4})',
-            query, re.IGNORECASE
-        )
+        publisher_match = _PUBLISHER_RE.search(query)
         if publisher_match:
             entities["publisher"] = publisher_match.group(1).strip()
         
         # 5. Location/Coverage - patterns: "di X" (place names)
-        location_match = re.search(
-            r'\bdi\s+(Indonesia|Jawa|Sumatera|Kalimantan|Sulawesi|Bali|Papua|'
-            r'Jakarta|Bandung|Surabaya|Medan|Yogyakarta|Semarang|Malang|'
-            r'Asia|Eropa|Amerika|Afrika|Australia)\b',
-            query, re.IGNORECASE
-        )
-        if location_match:
-            entities["location"] = location_match.group(1)
+        if location:
+            entities["location"] = location
         
         # 6. Source/Journal - patterns: "jurnal X", "journal X", "di jurnal X"
-        journal_match = re.search(
-            r'(?:jurnal|journal|majalah|di\s+jurnal|di\s+journal)\s+([a-zA-Z]+(?:\s+[a-zA-Z]+){0,4})',
-            query, re.IGNORECASE
-        )
+        journal_match = _JOURNAL_RE.search(query)
         if journal_match:
             entities["source"] = journal_match.group(1).strip()
         
         # 7. DOI pattern
-        doi_match = re.search(r'(10\.\d{4,}/[^\s]+)', query)
+        doi_match = _DOI_RE.search(query)
         if doi_match:
             entities["doi"] = doi_match.group(1)
         
-        # 8. Document type - patterns: specific keywords
-        type_map = {
-            r'\b(thesis|tesis|skripsi|disertasi)\b': DocumentType.THESIS,
-            r'\b(conference|konferensi|seminar|prosiding)\b': DocumentType.CONFERENCE,
-            r'\b(buku|book)\b': DocumentType.BOOK,
-            r'\b(laporan|report)\b': DocumentType.REPORT,
-            r'\b(jurnal|journal|artikel)\b': DocumentType.JOURNAL,
-        }
-        for pattern, doc_type in type_map.items():
-            if re.search(pattern, query_lower):
-                entities["doc_type"] = doc_type
-                break
+        # 8. Document type - specific keywords
+        if doc_type:
+            entities["doc_type"] = doc_type
         
         return entities
 
-    def _extract_keywords(self, cleaned_query: str, entities: Dict[str, Any] = None) -> List[str]:
+    @staticmethod
+    def _scan_vocabularies(query: str) -> Tuple[Optional[str], Optional[str], Optional[DocumentType]]:
+        """
+        Tag language, location and document type in a single pass over the query words.
+        Returns (language code, location as written in the query, document type).
+        """
+        language = None
+        location = None
+        doc_type = None
+        prev = ""
+        
+        for token in _TOKEN_RE.findall(query):
+            word = token.lower()
+            if language is None and prev in _LANGUAGE_TRIGGERS and word in _LANGUAGES:
+                language = _LANGUAGES[word]
+            if location is None and prev == "di" and word in _LOCATIONS:
+                location = token
+            # Earlier entries in _DOC_TYPES win regardless of position in the query
+            matched_type = _DOC_TYPES.get(word)
+            if matched_type is not None and (
+                doc_type is None or _DOC_TYPE_PRIORITY[matched_type] < _DOC_TYPE_PRIORITY[doc_type]
+            ):
+                doc_type = matched_type
+            prev = word
+        
+        return language, location, doc_type
+
+    @staticmethod
+    def _extract_keywords(cleaned_query: str, entities: Dict[str, Any] = None) -> List[str]:
         """Extract meaningful keywords from query, excluding already-extracted entity values."""
-        stopwords = {
-            'di', 'dan', 'yang', 'untuk', 'dengan', 'dari', 'ke', 'ini', 'itu',
-            'adalah', 'pada', 'dalam', 'oleh', 'akan', 'atau', 'juga', 'sudah',
-            'ada', 'bisa', 'dapat', 'saya', 'apa', 'bagaimana', 'mengapa', 'kapan',
-            'tentang', 'mengenai', 'terkait', 'seputar', 'informasi', 'jelaskan',
-            'hasil', 'penelitian', 'penulis', 'author', 'bahasa', 'berbahasa',
-            'tahun', 'diterbitkan', 'penerbit', 'jurnal', 'journal', 'oleh',
-            'karya', 'ditulis', 'published'
-        }
+        excluded = _STOPWORDS
         
-        words = cleaned_query.split()
-        keywords = [w for w in words if w not in stopwords and len(w) > 2]
-        
-        # Remove entity values from keywords to avoid duplication
+        # Exclude entity values from keywords to avoid duplication
         if entities:
             entity_words = set()
             for key, val in entities.items():
@@ -229,9 +303,9 @@ class ChatService:
                     entity_words.update(val.lower().split())
                 elif isinstance(val, int):
                     entity_words.add(str(val))
-            keywords = [k for k in keywords if k not in entity_words]
+            excluded = _STOPWORDS | entity_words
         
-        return keywords
+        return [w for w in cleaned_query.split() if len(w) > 2 and w not in excluded]
 
     # =========================================================================
     # Metadata Filtering
@@ -303,57 +377,9 @@ class ChatService:
         return filters
 
     # =========================================================================
-    # Hybrid Search (Semantic + Keyword + Metadata)
+    # Hybrid Search (Semantic + Metadata)
     # =========================================================================
 
-    def _calculate_keyword_score(self, content: str, doc: 'Document', keywords: List[str]) -> float:
-        """
-        Calculate keyword matching score (0.0 to 1.0) using all Dublin Core metadata.
-        Searches in: title, creator, keywords, description, publisher, contributor, 
-                     date, abstract, language, relation
-        """
-        if not keywords:
-            return 0.0
-        
-        content_lower = content.lower()
-        
-        # Convert date to string for matching
-        date_str = str(doc.date) if doc.date else ""
-        
-        # All Dublin Core metadata fields with weights
-        metadata_fields = {
-            'title': (doc.title.lower() if doc.title else "", 3),
-            'keywords': (doc.keywords.lower() if doc.keywords else "", 2.5),
-            'abstract': (doc.abstract.lower() if doc.abstract else "", 2),
-            'description': (doc.description.lower() if doc.description else "", 1.5),
-            'creator': (doc.creator.lower() if doc.creator else "", 1.5),
-            'contributor': (doc.contributor.lower() if doc.contributor else "", 1.5),
-            'publisher': (doc.publisher.lower() if doc.publisher else "", 1),
-            'source': (doc.source.lower() if doc.source else "", 1),
-            'relation': (doc.relation.lower() if doc.relation else "", 1),
-            'language': (doc.language.lower() if doc.language else "", 0.5),
-            'date': (date_str, 0.5),
-        }
-        
-        total_score = 0
-        max_possible = 0
-        
-        for keyword in keywords:
-            keyword_matched = False
-            
-            for field_name, (field_value, weight) in metadata_fields.items():
-                if keyword in field_value:
-                    total_score += weight
-                    keyword_matched = True
-                    break
-            
-            if not keyword_matched and keyword in content_lower:
-                total_score += 0.5
-            
-            max_possible += 3
-        
-        return min(total_score / max_possible, 1.0) if max_possible > 0 else 0.0
-
     def _retrieve_relevant_chunks(
         self, 
         query: str, 
@@ -365,8 +391,10 @@ class ChatService:
         Retrieve relevant document chunks using hybrid search:
         1. Metadata filtering (Dublin Core pre-filter)
         2. Semantic similarity (embedding cosine distance)
-        3. Keyword matching boost
+        3. Hybrid re-ranking (content vs. question embedding, metadata boost)
         4. Document diversification (max chunks per document)
+        
+        Steps 3 and 4 run inside the database, see _rank_candidates().
         """
         query_embedding = generate_embedding(query)
         
@@ -377,23 +405,11 @@ class ChatService:
         MIN_CONTENT_LENGTH = 100
         MAX_CHUNKS_PER_DOCUMENT = 10
         
-        keywords = self._extract_keywords(query)
-        
-        # Build base query with both content embedding and question embedding scores
-        content_sim = (1 - DocumentChunk.embedding.cosine_distance(query_embedding)).label('semantic_score')
-        
-        # Question embedding similarity: use CASE to handle NULLs
-        question_sim = case(
-            (DocumentChunk.possibly_question_embedding.isnot(None),
-             1 - DocumentChunk.possibly_question_embedding.cosine_distance(query_embedding)),
-            else_=literal(0.0)
-        ).label('question_score')
-        
+        # Base candidate query: eligible chunks only, scores are added per
+        # ANN branch in _rank_candidates()
         base_query = self.db.query(
-            DocumentChunk,
-            Document,
-            content_sim,
-            question_sim
+            DocumentChunk.id.label('chunk_id'),
+            DocumentChunk.document_id.label('document_id')
         ).join(
             Document, DocumentChunk.document_id == Document.id
         ).filter(
@@ -409,9 +425,9 @@ class ChatService:
             DocumentChunk.embedding.isnot(None)
         )
 
-        print("========== BASE QUERY ==========")
-        print(base_query)
-        print("============================================")
+        # str(query) compiles the whole clause tree, so only do it when asked for
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Base query:\n%s", base_query)
         
         # Apply metadata filters from entity extraction
         has_metadata_filters = metadata_filters and len(metadata_filters) > 0
@@ -420,99 +436,138 @@ class ChatService:
         print(has_metadata_filters)
         print("============================================")
 
+        # Per-transaction recall/speed trade-off for the HNSW index scan
+        self.db.execute(text(f"SET LOCAL hnsw.ef_search = {HNSW_EF_SEARCH}"))
         if has_metadata_filters:
-            filtered_query = base_query.filter(*metadata_filters)
-            filtered_results = filtered_query.order_by(
-                desc('semantic_score')
-            ).limit(limit * 4).all()
-            
-            print(f"  Metadata-filtered results: {len(filtered_results)} chunks")
-            
-            # If filtered results are too few, fallback to unfiltered
-            if len(filtered_results) >= 2:
-                chunks_with_distance = filtered_results
-            else:
-                print("  Too few filtered results, falling back to unfiltered search")
-                chunks_with_distance = base_query.order_by(
-                    desc('semantic_score')
-                ).limit(limit * 4).all()
-        else:
-            chunks_with_distance = base_query.order_by(
-                desc('semantic_score')
-            ).limit(limit * 4).all()
-        
-        # Re-rank with hybrid scoring (content + question + keyword)
-        scored_chunks = []
-        for chunk, doc, semantic_score, question_score in chunks_with_distance:
-            if semantic_score is None:
-                continue
-            
-            keyword_score = self._calculate_keyword_score(
-                chunk.content, 
-                doc,
-                keywords
-            )
-            
-            # Combined semantic score: best of content embedding and question embedding
-            # question_score is 0.0 when possibly_question_embedding is NULL
-            q_score = float(question_score) if question_score else 0.0
-            combined_semantic = max(float(semantic_score), q_score)
-            
-            # Hybrid score: 70% combined semantic + 30% keyword
-            if has_metadata_filters:
-                hybrid_score = combined_semantic
-            else:
-                hybrid_score = combined_semantic
-                
-            # if has_metadata_filters:
-            #     hybrid_score = (combined_semantic * 0.85) + (keyword_score * 0.15)
-            # else:
-            #     hybrid_score = (combined_semantic * 0.7) + (keyword_score * 0.3)
-            
-            # Bonus if document matched metadata filters
-            if has_metadata_filters:
-                hybrid_score *= 1.1  # 10% boost for metadata-matched docs
-
-            print(f"  Chunk {chunk.id}: content_sim={float(semantic_score):.4f}, question_sim={q_score:.4f}, combined={combined_semantic:.4f}, keyword={keyword_score:.4f}, hybrid={hybrid_score:.4f}")
-            
-            scored_chunks.append({
-                'chunk': chunk,
-                'document_id': doc.id,
-                'document_title': doc.title,
-                'semantic_score': float(semantic_score),
-                'question_score': q_score,
-                'combined_semantic': combined_semantic,
-                'keyword_score': keyword_score,
-                'hybrid_score': hybrid_score
-            })
-        
-        # Sort by hybrid score
-        scored_chunks.sort(key=lambda x: x['hybrid_score'], reverse=True)
-        
-        # Apply document diversification and threshold
+            self.db.execute(text(f"SET LOCAL hnsw.iterative_scan = {HNSW_ITERATIVE_SCAN}"))
+
+        # Filtered and unfiltered candidates are fetched together, so the
+        # "too few metadata matches" fallback needs no second query.
+        results = self._rank_candidates(
+            base_query,
+            query_embedding,
+            limit=limit,
+            threshold=threshold,
+            max_per_document=MAX_CHUNKS_PER_DOCUMENT,
+            metadata_filters=metadata_filters if has_metadata_filters else None
+        )
+        
         chunks = []
         similarities = []
-        doc_chunk_count = {}
-        
-        for item in scored_chunks:
-            doc_id = item['document_id']
-            hybrid_score = item['hybrid_score']
-            
-            if hybrid_score < threshold:
-                continue
-            
-            if doc_chunk_count.get(doc_id, 0) >= MAX_CHUNKS_PER_DOCUMENT:
-                continue
-            
-            chunks.append(item['chunk'])
-            similarities.append(hybrid_score)
-            doc_chunk_count[doc_id] = doc_chunk_count.get(doc_id, 0) + 1
-            
-            if len(chunks) >= limit:
-                break
+        for chunk, semantic_score, question_score, hybrid_score in results:
+            print(f"  Chunk {chunk.id}: content_sim={float(semantic_score):.4f}, question_sim={float(question_score):.4f}, hybrid={float(hybrid_score):.4f}")
+            chunks.append(chunk)
+            similarities.append(float(hybrid_score))
         
         return chunks, similarities
 
+    def _rank_candidates(
+        self,
+        candidate_query,
+        query_embedding: List[float],
+        limit: int,
+        threshold: float,
+        max_per_document: int,
+        metadata_filters: List = None
+    ) -> List[Tuple[DocumentChunk, float, float, float]]:
+        """
+        Re-rank semantic candidates in the database.
+        
+        Candidates come from nearest-neighbour scans of `limit * 2` rows each,
+        one on the content embedding and one on the question embedding (chunks
+        that have one), each ordered by its bare `<=>` distance so pgvector can
+        answer it from the matching HNSW index. The union is merged per chunk
+        and scored with hybrid = max(content_sim, question_sim); at most
+        `max_per_document` chunks per document are kept via ROW_NUMBER() and
+        the threshold is applied, all in a single statement.
+        
+        With metadata filters, both scans also run with the filters in WHERE
+        (as iterative index scans, see HNSW_ITERATIVE_SCAN) and their rows are
+        flagged `matches_filters`. If at least MIN_FILTERED_RESULTS matching
+        chunks are left after the per-document cap and the threshold, only
+        those are returned; otherwise matching and non-matching candidates are
+        ranked together. Scores get a 10% boost whenever filters were applied.
+        """
+        content_distance = DocumentChunk.embedding.cosine_distance(query_embedding)
+        question_distance = DocumentChunk.possibly_question_embedding.cosine_distance(query_embedding)
+        content_scores = ((1 - content_distance).label('semantic_score'), literal(0.0).label('question_score'))
+        question_scores = (literal(0.0).label('semantic_score'), (1 - question_distance).label('question_score'))
+        
+        def nearest(query, distance, scores, matches_filters: bool):
+            return query.add_columns(
+                *scores, literal(matches_filters).label('matches_filters')
+            ).order_by(distance).limit(limit * 2).subquery()
+        
+        def with_question(query):
+            return query.filter(DocumentChunk.possibly_question_embedding.isnot(None))
+        
+        # (a) nearest chunks by content embedding, (b) by question embedding
+        branches = [
+            nearest(candidate_query, content_distance, content_scores, False),
+            nearest(with_question(candidate_query), question_distance, question_scores, False),
+        ]
+        if metadata_filters:
+            filtered_query = candidate_query.filter(*metadata_filters)
+            branches += [
+                nearest(filtered_query, content_distance, content_scores, True),
+                nearest(with_question(filtered_query), question_distance, question_scores, True),
+            ]
+        
+        # A matching chunk close enough for an unfiltered branch is also in
+        # the filtered branch, so bool_or() flags it correctly
+        merged = union_all(*(select(branch) for branch in branches)).subquery('merged')
+        candidates = select(
+            merged.c.chunk_id,
+            merged.c.document_id,
+            func.max(merged.c.semantic_score).label('semantic_score'),
+            func.max(merged.c.question_score).label('question_score'),
+            func.bool_or(merged.c.matches_filters).label('matches_filters')
+        ).group_by(
+            merged.c.chunk_id, merged.c.document_id
+        ).cte('candidates')
+        
+        boost = 1.1 if metadata_filters else 1.0  # 10% boost for metadata-filtered searches
+        hybrid = func.greatest(candidates.c.semantic_score, candidates.c.question_score) * boost
+        
+        scored = self.db.query(
+            candidates.c.chunk_id,
+            candidates.c.semantic_score,
+            candidates.c.question_score,
+            candidates.c.matches_filters,
+            hybrid.label('hybrid_score'),
+            func.row_number().over(
+                partition_by=candidates.c.document_id,
+                order_by=hybrid.desc()
+            ).label('rn')
+        ).subquery('scored')
+        
+        # Matching chunks left after the per-document cap and the threshold
+        eligible = self.db.query(
+            scored,
+            func.count().filter(scored.c.matches_filters).over().label('matching_count')
+        ).filter(
+            scored.c.rn <= max_per_document,
+            scored.c.hybrid_score >= threshold
+        ).subquery('eligible')
+        
+        results = self.db.query(
+            DocumentChunk,
+            eligible.c.semantic_score,
+            eligible.c.question_score,
+            eligible.c.hybrid_score
+        ).join(
+            eligible, DocumentChunk.id == eligible.c.chunk_id
+        )
+        if metadata_filters:
+            # Fall back to unfiltered candidates only when too few chunks match
+            results = results.filter(or_(
+                eligible.c.matches_filters,
+                eligible.c.matching_count < MIN_FILTERED_RESULTS
+            ))
+        return results.order_by(
+            desc(eligible.c.hybrid_score)
+        ).limit(limit).all()
+
     # =========================================================================
     # Context & Prompt Construction
     # =========================================================================
@@ -567,18 +622,23 @@ Jawab dengan: {no_context_msg}"""
     # =========================================================================
 
     def _save_rag_references(self, bot_chat_id: int, chunks: List[DocumentChunk], similarities: List[float]):
-        """Save references for the RAG response."""
-        for i, chunk in enumerate(chunks):
-            reference = ChatReference(
-                chat_id=bot_chat_id,
-                document_id=chunk.document_id,
-                chunk_id=chunk.id,
-                relevance_score=float(similarities[i]),
-                quote=chunk.content[:200],
-                page_number=chunk.page_number
-            )
-            self.db.add(reference)
-        self.db.commit()
+        """
+        Save references for the RAG response as a single multi-row INSERT.
+        Does not commit; the caller commits together with the bot message.
+        """
+        if not chunks:
+            return
+        self.db.execute(insert(ChatReference), [
+            {
+                "chat_id": bot_chat_id,
+                "document_id": chunk.document_id,
+                "chunk_id": chunk.id,
+                "relevance_score": float(similarities[i]),
+                "quote": chunk.content[:200],
+                "page_number": chunk.page_number,
+            }
+            for i, chunk in enumerate(chunks)
+        ])
 
     # =========================================================================
     # Main Chat Processing
@@ -644,11 +704,13 @@ Jawab dengan: {no_context_msg}"""
         print(ragas_data)
         print("============================================")
 
-        # 8. Save Bot Message
-        bot_chat = self._save_chat_message(conversation.id, ChatRole.BOT, answer)
+        # 8. Save Bot Message (flush only, to get its id)
+        bot_chat = self._save_chat_message(conversation.id, ChatRole.BOT, answer, commit=False)
 
-        # 9. Save References
+        # 9. Save References, then commit bot message + references together
         self._save_rag_references(bot_chat.id, chunks, similarities)
+        self.db.commit()
+        self.db.refresh(bot_chat)
 
         return ChatResponse(
             id=bot_chat.id,
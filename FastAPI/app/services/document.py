@@ -1,17 +1,47 @@
 """Document processing service - handles PDF upload, GROBID extraction, and embedding."""
+import asyncio
+import bisect
+import hashlib
+import heapq
+import logging
+import os
+import re
+import threading
+import time
 import uuid
 from io import BytesIO
-from datetime import timedelta
-from typing import Optional, List, Dict, Any, Callable
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import filterfalse
+from typing import Optional, List, Dict, Any, Callable, BinaryIO, Tuple
+from collections import Counter, OrderedDict
 from dataclasses import dataclass
+from sqlalchemy import insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from fastapi import UploadFile, HTTPException
 
+# Try both import names (pymupdf for v1.25+, fitz for older); resolved once
+# here, _extract_raw_pdf_text reports a 500 if neither is installed
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf
+    except ImportError:
+        pymupdf = None
+
 from app.config import get_settings
+from app.database import SessionLocal
 from app.models.document import Document, DocumentType
 from app.models.document_chunk import DocumentChunk, ChunkType
-from app.services.grobid import extract_header, extract_fulltext, extract_references, format_for_database, extract_structured_fulltext
-from app.services.embedding import generate_embedding
+from app.models.embedding_cache import EmbeddingCache
+from app.services.grobid import (
+    extract_header,
+    extract_fulltext_document_async,
+    format_for_database,
+)
+from app.services.embedding import embedding_batcher
 from app.services.minio import get_minio_client
 from app.services.question_generator import generate_possibly_questions
 from app.services.metadata_extractor import (
@@ -21,12 +51,21 @@ from app.services.metadata_extractor import (
 )
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 # Constants
 MAX_PDF_SIZE = 50 * 1024 * 1024  # 50MB
 DEFAULT_CHUNK_SIZE = 500
 DEFAULT_CHUNK_OVERLAP = 50
 WORDS_PER_PAGE = 500
+EMBEDDING_BATCH_SIZE = 32  # Chunk texts sent per embedding request
+EXTRACTION_CACHE_SIZE = 16  # Recent GROBID/PyMuPDF results kept per process
+UPLOAD_READ_SIZE = 64 * 1024  # Bytes read per step when validating uploads
+PDF_MAGIC = b"%PDF-"
+PROGRESS_MIN_INTERVAL = 0.25  # Seconds between repeated progress updates
+EMBEDDING_CACHE_LOCK_TIMEOUT = "500ms"  # Skip cache writes stuck behind another writer
+
+_WORD_RE = re.compile(r"\S+")  # Whitespace-delimited word
 
 # Smart chunking constants
 MIN_CHUNK_WORDS = 80       # Merge paragraphs shorter than this
@@ -64,6 +103,23 @@ _STOPWORDS = frozenset({
     "yaitu", "yakni", "maupun", "adapun", "sedangkan", "maka", "pun",
 })
 
+# PyMuPDF is not thread-safe; extraction runs in worker threads, one at a time
+_pymupdf_lock = threading.Lock()
+
+# Date formats accepted from LLM metadata; the pattern picks the format so
+# strptime runs at most once per date string
+_DATE_FORMATS = (
+    (re.compile(r"\d{4}-\d{1,2}-\d{1,2}"), "%Y-%m-%d"),
+    (re.compile(r"\d{4}-\d{1,2}"), "%Y-%m"),
+    (re.compile(r"\d{4}"), "%Y"),
+    (re.compile(r"\d{1,2}\s+[A-Za-z]+\s+\d{4}"), "%d %B %Y"),
+    (re.compile(r"[A-Za-z]+\s+\d{4}"), "%B %Y"),
+)
+
+# Extraction results by file hash, so a retried upload of the same PDF
+# (e.g. after an embedding failure rolled it back) skips GROBID and PyMuPDF
+_extraction_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
 
 # =============================================================================
 # Data Classes
@@ -95,48 +151,92 @@ class FileValidator:
             raise HTTPException(status_code=400, detail="File must be a PDF")
     
     @staticmethod
-    def validate_size(content: bytes) -> None:
-        """Validate file size."""
-        if len(content) > MAX_PDF_SIZE:
+    def validate_upload_size(file: UploadFile) -> None:
+        """Reject oversized uploads before reading them, when the size is known."""
+        if file.size is not None and file.size > MAX_PDF_SIZE:
             raise HTTPException(
                 status_code=400,
                 detail=f"File too large. Maximum size: {MAX_PDF_SIZE // (1024 * 1024)}MB"
             )
+    
+    @staticmethod
+    async def validate_and_read(file: UploadFile) -> tuple[bytes, str]:
+        """
+        Read upload in one pass: check PDF signature, enforce size limit
+        as bytes arrive, and hash the content. Returns (content, file_hash).
+        """
+        content = bytearray()
+        hasher = hashlib.blake2b(digest_size=32)
+        
+        while chunk := await file.read(UPLOAD_READ_SIZE):
+            if not content and PDF_MAGIC not in chunk[:1024]:
+                raise HTTPException(status_code=400, detail="File is not a valid PDF")
+            content += chunk
+            if len(content) > MAX_PDF_SIZE:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"File too large. Maximum size: {MAX_PDF_SIZE // (1024 * 1024)}MB"
+                )
+            hasher.update(chunk)
+        
+        if not content:
+            raise HTTPException(status_code=400, detail="File is empty")
+        
+        return bytes(content), hasher.hexdigest()
 
 
 # =============================================================================
 # MinIO Storage Operations
 # =============================================================================
 
+def _uuid7() -> uuid.UUID:
+    """Time-ordered UUID (version 7): 48-bit millisecond timestamp + random bits."""
+    value = ((time.time_ns() // 1_000_000) << 80) | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return uuid.UUID(int=value)
+
+
 class MinIOStorage:
     """Handles MinIO storage operations."""
     
     def __init__(self):
         self.client = get_minio_client()
         self.bucket = settings.MINIO_DOCUMENTS_BUCKET
+        self._bucket_checked = False
     
     def ensure_bucket_exists(self) -> None:
         """Create bucket if it doesn't exist."""
         try:
             if not self.client.bucket_exists(self.bucket):
                 self.client.make_bucket(self.bucket)
+            self._bucket_checked = True
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"MinIO error: {str(e)}")
     
     def upload_file(self, content: bytes, original_filename: str) -> str:
         """Upload file to MinIO. Returns unique filename."""
+        return self.upload_stream(BytesIO(content), len(content), original_filename)
+    
+    def upload_stream(self, stream: BinaryIO, length: int, original_filename: str) -> str:
+        """Upload file-like object to MinIO without buffering it. Returns unique filename."""
         extension = original_filename.split(".")[-1].lower() if original_filename else "pdf"
-        unique_filename = f"{uuid.uuid4()}.{extension}"
+        # Date prefix + time-ordered id keeps consecutive uploads next to each other
+        # in the object namespace (note: the name reveals the upload time)
+        unique_filename = f"{datetime.now(timezone.utc):%Y/%m/%d}/{_uuid7()}.{extension}"
         
-        self.ensure_bucket_exists()
+        if not self._bucket_checked:
+            self.ensure_bucket_exists()
         
         try:
             self.client.put_object(
                 self.bucket,
                 unique_filename,
-                BytesIO(content),
-                length=len(content),
-                content_type="application/pdf"
+                stream,
+                length=length,
+                content_type="application/pdf",
+                part_size=settings.MINIO_PART_SIZE,
+                num_parallel_uploads=settings.MINIO_UPLOAD_CONCURRENCY
             )
             return unique_filename
         except Exception as e:
@@ -162,6 +262,12 @@ class MinIOStorage:
             raise HTTPException(status_code=500, detail=f"Failed to get download URL: {str(e)}")
 
 
+@lru_cache(maxsize=1)
+def get_storage() -> MinIOStorage:
+    """Get shared MinIOStorage instance (one client and connection pool per process)."""
+    return MinIOStorage()
+
+
 # =============================================================================
 # Text Chunking (Legacy - kept for backward compatibility)
 # =============================================================================
@@ -172,38 +278,43 @@ class TextChunker:
     def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP):
         self.chunk_size = chunk_size
         self.overlap = overlap
+        self.step = chunk_size - overlap  # Words between window starts
     
     def chunk_text(self, text: str, document_title: str = None) -> List[Dict[str, Any]]:
         """Split text into overlapping chunks with metadata."""
-        if not text or not text.strip():
+        if not text:
             return []
         
-        text = text.strip()
-        words = text.split()
-        total_words = len(words)
+        # (start_char, end_char) of every word; chunks are sliced from the original text
+        offsets = [m.span() for m in _WORD_RE.finditer(text)]
+        total_words = len(offsets)
+        if not total_words:
+            return []
         
         chunks = []
-        start = 0
         chunk_index = 0
         
-        while start < len(words):
-            end = start + self.chunk_size
-            chunk_words = words[start:end]
-            chunk_content = " ".join(chunk_words)
-            
-            if chunk_content.strip():
-                chunks.append(self._create_chunk_dict(
-                    chunk_index=chunk_index,
-                    content=chunk_content,
-                    word_count=len(chunk_words),
-                    word_start=start,
-                    word_end=min(end, total_words),
-                    total_words=total_words,
-                    document_title=document_title
-                ))
-                chunk_index += 1
-            
-            start = end - self.overlap if end < len(words) else len(words)
+        # Per-document metadata shared by every chunk
+        base_metadata = {"source_document": document_title, "total_words": total_words}
+        inv_total = 1.0 / total_words
+        
+        # Window starts: every `step` words until a window reaches the end of the text
+        step = self.step
+        last_start = max(0, -(-(total_words - self.chunk_size) // step) * step)
+        
+        for start in range(0, last_start + 1, step):
+            end = min(start + self.chunk_size, total_words)
+            # Windows always span at least one word, so content is never empty
+            chunks.append(self._create_chunk_dict(
+                chunk_index=chunk_index,
+                content=text[offsets[start][0]:offsets[end - 1][1]],
+                word_count=end - start,
+                word_start=start,
+                word_end=end,
+                base_metadata=base_metadata,
+                inv_total=inv_total
+            ))
+            chunk_index += 1
         
         return chunks
     
@@ -214,8 +325,8 @@ class TextChunker:
         word_count: int,
         word_start: int,
         word_end: int,
-        total_words: int,
-        document_title: str = None
+        base_metadata: Dict[str, Any],
+        inv_total: float
     ) -> Dict[str, Any]:
         """Create chunk dictionary with metadata."""
         estimated_page = (word_start // WORDS_PER_PAGE) + 1
@@ -228,11 +339,10 @@ class TextChunker:
             "page_number": estimated_page,
             "section_title": None,
             "chunk_metadata": {
-                "source_document": document_title,
+                **base_metadata,
                 "word_start": word_start,
                 "word_end": word_end,
-                "total_words": total_words,
-                "relative_position": round(word_start / total_words, 3) if total_words > 0 else 0,
+                "relative_position": round(word_start * inv_total, 3),
                 "chunk_size": word_count,
                 "has_overlap": word_start > 0
             }
@@ -260,10 +370,11 @@ class TextChunker:
     @staticmethod
     def create_abstract_chunk(abstract: str, document_title: str = None) -> Dict[str, Any]:
         """Create special chunk for abstract."""
+        word_count = len(abstract.split())
         return {
             "chunk_index": 0,
             "content": abstract,
-            "token_count": len(abstract.split()),
+            "token_count": word_count,
             "chunk_type": ChunkType.ABSTRACT,
             "page_number": 1,
             "section_title": "Abstract",
@@ -271,7 +382,7 @@ class TextChunker:
                 "source_document": document_title,
                 "section": "abstract",
                 "is_summary": True,
-                "word_count": len(abstract.split())
+                "word_count": word_count
             }
         }
     
@@ -282,11 +393,22 @@ class TextChunker:
             chunk["chunk_index"] = i
 
 
+@lru_cache(maxsize=16)
+def get_text_chunker(chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP) -> TextChunker:
+    """Get shared TextChunker for a (chunk_size, overlap) pair (chunkers are stateless)."""
+    return TextChunker(chunk_size, overlap)
+
+
 # =============================================================================
 # Smart Chunking (Section & Paragraph-aware)
 # =============================================================================
 
-import re as _re
+# Sentence boundary: end punctuation + whitespace before an uppercase letter,
+# or a paragraph break. Led by the punctuation class (group 1 is the gap) so the
+# regex engine can skip ahead to candidates instead of testing every space.
+_SENTENCE_RE = re.compile(r'[.!?](\s+)(?=[A-Z\u00C0-\u024F])|\n{2,}')
+# Keyword token: alphabetic word (incl. accented Latin) of 3+ letters
+_KEYWORD_RE = re.compile(r'[a-zA-Z\u00C0-\u024F]{3,}')
 
 
 class SmartChunker:
@@ -323,7 +445,7 @@ class SmartChunker:
         Smart-chunk a list of structured sections from GROBID.
         
         Args:
-            sections: Output of extract_structured_fulltext()
+            sections: Structured sections from extract_fulltext_document_async()
             document_title: Title of the document (for metadata)
             pages_data: Per-page text from PyMuPDF [{"page_number": int, "text": str}]
         
@@ -332,6 +454,10 @@ class SmartChunker:
         """
         all_chunks: List[Dict[str, Any]] = []
         
+        # Searchable index over all pages, built once per document
+        page_index = self._build_page_index(pages_data) if pages_data else None
+        last_page = None  # Page of the previous chunk, where the next search starts
+        
         for section in sections:
             sec_type = section.get("type", "section")
             sec_title = section.get("title", "")
@@ -355,32 +481,32 @@ class SmartChunker:
                 chunk_type=chunk_type,
                 document_title=document_title,
             )
-            all_chunks.extend(section_chunks)
-        
-        # Re-index all chunks sequentially
-        for i, chunk in enumerate(all_chunks):
-            chunk["chunk_index"] = i
-        
-        # Enrich chunks: resolve page numbers + extract keywords
-        for chunk in all_chunks:
-            # Resolve accurate page number from PyMuPDF page data
-            if pages_data:
-                resolved_page = self._find_page_number(chunk["content"], pages_data)
-                if resolved_page is not None:
-                    chunk["page_number"] = resolved_page
-                    chunk["chunk_metadata"]["page_number"] = resolved_page
             
-            # Extract keywords for this chunk
-            keywords = self._extract_keywords(chunk["content"])
-            chunk["chunk_metadata"]["keywords"] = keywords
+            # Index and enrich the section's chunks in the same pass that collects them
+            for chunk in section_chunks:
+                chunk["chunk_index"] = len(all_chunks)
+                
+                # Resolve accurate page number from PyMuPDF page data
+                if page_index:
+                    resolved_page = self._find_page_number(chunk["content"], page_index, last_page)
+                    if resolved_page is not None:
+                        last_page = resolved_page
+                        chunk["page_number"] = resolved_page
+                        chunk["chunk_metadata"]["page_number"] = resolved_page
+                
+                # Extract keywords for this chunk
+                chunk["chunk_metadata"]["keywords"] = self._extract_keywords(chunk["content"])
+                all_chunks.append(chunk)
+        
+        logger.info("SmartChunker: %d sections -> %d chunks", len(sections), len(all_chunks))
         
         # Validate: count total characters to ensure nothing is lost
-        input_chars = sum(
-            len(" ".join(s.get("paragraphs", []))) for s in sections
-        )
-        output_chars = sum(len(c["content"]) for c in all_chunks)
-        print(f"SmartChunker: {len(sections)} sections -> {len(all_chunks)} chunks")
-        print(f"SmartChunker: Input chars={input_chars}, Output chars={output_chars}")
+        if logger.isEnabledFor(logging.DEBUG):
+            input_chars = sum(
+                len(" ".join(s.get("paragraphs", []))) for s in sections
+            )
+            output_chars = sum(len(c["content"]) for c in all_chunks)
+            logger.debug("SmartChunker: Input chars=%d, Output chars=%d", input_chars, output_chars)
         
         return all_chunks
     
@@ -397,7 +523,8 @@ class SmartChunker:
         - Split long paragraphs at sentence boundaries
         """
         chunks = []
-        buffer = ""  # Accumulator for merging short paragraphs
+        buffer_parts: List[str] = []  # Short paragraphs waiting to be merged
+        buffer_word_count = 0  # Word count of buffer_parts, kept in step with it
         
         for paragraph in paragraphs:
             paragraph = paragraph.strip()
@@ -405,28 +532,31 @@ class SmartChunker:
                 continue
             
             word_count = len(paragraph.split())
-            buffer_word_count = len(buffer.split()) if buffer else 0
             
-            if buffer:
+            if buffer_parts:
                 combined_word_count = buffer_word_count + word_count
                 
                 if combined_word_count <= self.max_chunk_words:
                     # Merge: combined is still within max limit
-                    buffer = buffer + "\n\n" + paragraph
+                    buffer_parts.append(paragraph)
+                    buffer_word_count = combined_word_count
                 else:
                     # Buffer is big enough, flush it as a chunk
                     chunks.extend(self._create_chunks_from_text(
-                        text=buffer,
+                        text="\n\n".join(buffer_parts),
                         section_title=section_title,
                         chunk_type=chunk_type,
                         document_title=document_title,
+                        word_count=buffer_word_count,
                     ))
-                    buffer = paragraph
+                    buffer_parts = [paragraph]
+                    buffer_word_count = word_count
             else:
                 # Buffer is empty, start accumulating
                 if word_count < self.min_chunk_words:
                     # Too short — start buffering for merging
-                    buffer = paragraph
+                    buffer_parts = [paragraph]
+                    buffer_word_count = word_count
                 else:
                     # Long enough on its own
                     if word_count > self.max_chunk_words:
@@ -436,29 +566,26 @@ class SmartChunker:
                             section_title=section_title,
                             chunk_type=chunk_type,
                             document_title=document_title,
+                            word_count=word_count,
                         ))
                     else:
                         # Just right — use as-is
-                        buffer = paragraph
-                        # Check if this paragraph is >= min, keep in buffer
-                        # to potentially merge with next short paragraph
-                        if word_count >= self.min_chunk_words:
-                            # Flush if it's a reasonable size
-                            chunks.extend(self._create_chunks_from_text(
-                                text=buffer,
-                                section_title=section_title,
-                                chunk_type=chunk_type,
-                                document_title=document_title,
-                            ))
-                            buffer = ""
+                        chunks.extend(self._create_chunks_from_text(
+                            text=paragraph,
+                            section_title=section_title,
+                            chunk_type=chunk_type,
+                            document_title=document_title,
+                            word_count=word_count,
+                        ))
         
         # Flush remaining buffer
-        if buffer.strip():
+        if buffer_parts:
             chunks.extend(self._create_chunks_from_text(
-                text=buffer,
+                text="\n\n".join(buffer_parts),
                 section_title=section_title,
                 chunk_type=chunk_type,
                 document_title=document_title,
+                word_count=buffer_word_count,
             ))
         
         return chunks
@@ -469,16 +596,19 @@ class SmartChunker:
         section_title: str,
         chunk_type: ChunkType,
         document_title: str = None,
+        word_count: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
         """
         Create one or more chunks from a text block.
         If text exceeds max_chunk_words, split at sentence boundaries.
+        Pass `word_count` when the caller already knows it.
         """
         text = text.strip()
         if not text:
             return []
         
-        word_count = len(text.split())
+        if word_count is None:
+            word_count = len(text.split())
         
         if word_count <= self.max_chunk_words:
             # Fits in a single chunk
@@ -487,6 +617,7 @@ class SmartChunker:
                 section_title=section_title,
                 chunk_type=chunk_type,
                 document_title=document_title,
+                word_count=word_count,
             )]
         
         # Split at sentence boundaries
@@ -506,6 +637,7 @@ class SmartChunker:
                     section_title=section_title,
                     chunk_type=chunk_type,
                     document_title=document_title,
+                    word_count=current_word_count,
                 ))
                 current_sentences = []
                 current_word_count = 0
@@ -521,16 +653,17 @@ class SmartChunker:
             if (
                 chunks 
                 and current_word_count < self.min_chunk_words
-                and len(chunks[-1]["content"].split()) + current_word_count <= self.max_chunk_words
+                and chunks[-1]["token_count"] + current_word_count <= self.max_chunk_words
             ):
                 chunks[-1]["content"] += " " + chunk_text
-                chunks[-1]["token_count"] = len(chunks[-1]["content"].split())
+                chunks[-1]["token_count"] += current_word_count
             else:
                 chunks.append(self._build_chunk_dict(
                     content=chunk_text,
                     section_title=section_title,
                     chunk_type=chunk_type,
                     document_title=document_title,
+                    word_count=current_word_count,
                 ))
         
         return chunks
@@ -541,15 +674,16 @@ class SmartChunker:
         section_title: str,
         chunk_type: ChunkType,
         document_title: str = None,
+        word_count: Optional[int] = None,
     ) -> Dict[str, Any]:
         """Build a single chunk dictionary with metadata."""
-        words = content.split()
-        word_count = len(words)
+        if word_count is None:
+            word_count = len(content.split())
         # Estimate page number from cumulative word position
         estimated_page = max(1, (word_count // WORDS_PER_PAGE) + 1)
         
         return {
-            "chunk_index": 0,  # Will be re-indexed later
+            "chunk_index": 0,  # Assigned by chunk_structured_sections
             "content": content,
             "token_count": word_count,
             "chunk_type": chunk_type,
@@ -584,12 +718,19 @@ class SmartChunker:
         """
         # Split on sentence-ending punctuation followed by space + uppercase,
         # or newlines that look like paragraph breaks
-        sentence_endings = _re.compile(
-            r'(?<=[.!?])\s+(?=[A-Z\u00C0-\u024F])|\n{2,}'
-        )
-        raw = sentence_endings.split(text)
-        # Filter empty and strip
-        return [s.strip() for s in raw if s and s.strip()]
+        sentences = []
+        start = 0
+        for match in _SENTENCE_RE.finditer(text):
+            # Keep the punctuation with its sentence; drop only the gap
+            end = match.start(1) if match.group(1) is not None else match.start()
+            sentence = text[start:end].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+        sentence = text[start:].strip()
+        if sentence:
+            sentences.append(sentence)
+        return sentences
     
     @staticmethod
     def _extract_keywords(text: str, max_keywords: int = KEYWORDS_PER_CHUNK) -> List[str]:
@@ -602,61 +743,94 @@ class SmartChunker:
             return []
         
         # Tokenize: lowercase, keep only alphabetic words of length >= 3
-        words = _re.findall(r'[a-zA-Z\u00C0-\u024F]{3,}', text.lower())
+        words = _KEYWORD_RE.findall(text.lower())
         
-        # Filter stopwords
-        meaningful = [w for w in words if w not in _STOPWORDS and len(w) >= 3]
+        # Count frequency, skipping stopwords (filtered in C, no generator frame)
+        freq = Counter(filterfalse(_STOPWORDS.__contains__, words))
         
-        if not meaningful:
+        if not freq:
             return []
         
-        # Count frequency
-        freq: Dict[str, int] = {}
-        for w in meaningful:
-            freq[w] = freq.get(w, 0) + 1
+        # Top keywords by frequency descending, then alphabetically for ties
+        # (partial heap selection; same order as a full sort truncated to k)
+        top_words = heapq.nsmallest(max_keywords, freq.items(), key=lambda x: (-x[1], x[0]))
         
-        # Sort by frequency descending, then alphabetically for ties
-        sorted_words = sorted(freq.items(), key=lambda x: (-x[1], x[0]))
-        
-        # Return top keywords
-        return [word for word, _ in sorted_words[:max_keywords]]
+        return [word for word, _ in top_words]
+    
+    @staticmethod
+    def _build_page_index(pages_data: List[Dict[str, Any]]) -> Tuple[str, List[int], List[int]]:
+        """
+        Concatenate normalized page texts (collapsed whitespace, lowercase) into
+        one searchable string. Returns (text, page start offsets, page numbers).
+        Pages are joined with a separator that never occurs in a snippet, so a
+        match can't span two pages.
+        """
+        starts = []
+        page_numbers = []
+        parts = []
+        offset = 0
+        for page in pages_data:
+            normalized = " ".join(page["text"].split()).lower()
+            starts.append(offset)
+            page_numbers.append(page["page_number"])
+            parts.append(normalized)
+            offset += len(normalized) + 1
+        return "\x1f".join(parts), starts, page_numbers
     
     @staticmethod
     def _find_page_number(
         chunk_content: str,
-        pages_data: List[Dict[str, Any]],
+        page_index: Tuple[str, List[int], List[int]],
+        from_page: Optional[int] = None,
     ) -> Optional[int]:
         """
         Find the actual PDF page number where the chunk content appears.
-        Matches by searching for a snippet of the chunk content in each page's text.
+        Searches for a snippet of the chunk content in the page index built by
+        _build_page_index(); the first (lowest) page containing it wins.
+        If `from_page` is given (e.g. the previous chunk's page), the first
+        match on or after that page wins instead, with earlier pages searched
+        only on a miss.
         Returns 1-based page number, or None if not found.
         """
-        if not chunk_content or not pages_data:
+        if not chunk_content or not page_index:
             return None
         
+        pages_text, starts, page_numbers = page_index
+        
+        # Offset to start searching from (chunks arrive in reading order)
+        hint = 0
+        if from_page is not None:
+            hint_idx = bisect.bisect_left(page_numbers, from_page)
+            if hint_idx < len(starts):
+                hint = starts[hint_idx]
+        
+        def locate(needle: str) -> int:
+            position = pages_text.find(needle, hint)
+            if position == -1 and hint:
+                position = pages_text.find(needle, 0, hint + len(needle))
+            return position
+        
         # Take a representative snippet from the chunk (first ~120 chars)
-        # Clean whitespace for better matching
-        snippet = " ".join(chunk_content.split()[:20])  # first ~20 words
+        # Clean whitespace for better matching; only the leading words are split
+        words = chunk_content.split(None, 20)[:20]  # first ~20 words
+        snippet = " ".join(words)
         if len(snippet) < 10:
             return None
         
         # Normalize for matching
-        snippet_normalized = snippet.lower().strip()
+        snippet_normalized = snippet.lower()
         
-        for page in pages_data:
-            page_text_normalized = " ".join(page["text"].split()).lower()
-            if snippet_normalized in page_text_normalized:
-                return page["page_number"]
+        position = locate(snippet_normalized)
         
         # Fallback: try with a shorter snippet (first 10 words)
-        short_snippet = " ".join(chunk_content.split()[:10]).lower().strip()
-        if len(short_snippet) >= 10:
-            for page in pages_data:
-                page_text_normalized = " ".join(page["text"].split()).lower()
-                if short_snippet in page_text_normalized:
-                    return page["page_number"]
-        
-        return None
+        if position == -1:
+            short_snippet = " ".join(words[:10]).lower()
+            if len(short_snippet) >= 10:
+                position = locate(short_snippet)
+        
+        if position == -1:
+            return None
+        return page_numbers[bisect.bisect_right(starts, position) - 1]
 
 
 # =============================================================================
@@ -699,6 +873,28 @@ class DocumentBuilder:
         )
 
 
+# =============================================================================
+# Progress Reporting
+# =============================================================================
+
+class ProgressThrottler:
+    """
+    Wraps a progress callback so repeated updates are sent at most once per
+    `min_interval` seconds. The first update and 100% always go through.
+    """
+    
+    def __init__(self, callback: Callable, min_interval: float = PROGRESS_MIN_INTERVAL):
+        self.callback = callback
+        self.min_interval = min_interval
+        self._last_sent = float("-inf")
+    
+    async def __call__(self, percent: int, message: str) -> None:
+        now = time.monotonic()
+        if percent >= 100 or now - self._last_sent >= self.min_interval:
+            self._last_sent = now
+            await self.callback(percent, message)
+
+
 # =============================================================================
 # Chunk Processor
 # =============================================================================
@@ -716,53 +912,162 @@ class ChunkProcessor:
         progress_callback: Optional[Callable] = None
     ) -> None:
         """Generate embeddings, hypothetical questions, and save chunks to database."""
+        if progress_callback:
+            # Cached batches finish in milliseconds; don't flood the websocket
+            progress_callback = ProgressThrottler(progress_callback)
         total_chunks = len(chunks)
+        rows = []
+        question_slots = asyncio.Semaphore(settings.QUESTION_GENERATION_CONCURRENCY)
+        questions_by_content: Dict[str, Optional[List[str]]] = {}  # Repeated chunks are asked once
+        
+        async def ask(chunk_data: Dict[str, Any]) -> List[str]:
+            async with question_slots:
+                return await generate_possibly_questions(
+                    chunk_content=chunk_data["content"],
+                    section_title=chunk_data.get("section_title"),
+                    document_title=chunk_data.get("chunk_metadata", {}).get("source_document"),
+                )
         
-        for i, chunk_data in enumerate(chunks):
-            # Progress update
-            if progress_callback and i % 5 == 0:
-                percent = 60 + int((i / total_chunks) * 30)
-                await progress_callback(percent, f"Processing chunk {i+1}/{total_chunks} (embedding + questions)...")
+        for batch_start in range(0, total_chunks, EMBEDDING_BATCH_SIZE):
+            batch = chunks[batch_start:batch_start + EMBEDDING_BATCH_SIZE]
             
-            content = chunk_data["content"]
+            # Progress update (once per embedding batch)
+            if progress_callback:
+                percent = 60 + (batch_start * 30) // total_chunks
+                await progress_callback(percent, f"Processing chunk {batch_start+1}/{total_chunks} (embedding + questions)...")
             
-            # Generate content embedding
-            embedding = generate_embedding(content)
+            # Contents not seen earlier in this document (first chunk of each wins)
+            to_ask: Dict[str, Dict[str, Any]] = {}
+            for chunk_data in batch:
+                if chunk_data["content"] not in questions_by_content:
+                    to_ask.setdefault(chunk_data["content"], chunk_data)
             
-            # Generate hypothetical questions from chunk content
-            possibly_questions = None
-            possibly_question_embedding = None
-            try:
-                section_title = chunk_data.get("section_title")
-                doc_title = chunk_data.get("chunk_metadata", {}).get("source_document")
-                questions = await generate_possibly_questions(
-                    chunk_content=content,
-                    section_title=section_title,
-                    document_title=doc_title,
-                )
-                if questions:
-                    possibly_questions = questions
-                    # Combine questions into a single text and generate embedding
-                    combined_questions = " ".join(questions)
-                    possibly_question_embedding = generate_embedding(combined_questions)
-            except Exception as e:
-                print(f"  Warning: question generation failed for chunk {i}: {e}")
+            # Generate content embeddings for the batch (reusing cached vectors) and
+            # hypothetical questions from chunk content, overlapping the two
+            embeddings, *results = await asyncio.gather(
+                self._embed_contents([chunk_data["content"] for chunk_data in batch]),
+                *(ask(chunk_data) for chunk_data in to_ask.values()),
+                return_exceptions=True,
+            )
+            if isinstance(embeddings, Exception):
+                raise embeddings
+            for (content, chunk_data), result in zip(to_ask.items(), results):
+                if isinstance(result, Exception):
+                    logger.warning("Question generation failed for chunk %d: %s", chunk_data["chunk_index"], result)
+                    result = None
+                questions_by_content[content] = result or None
+            batch_questions = [questions_by_content[chunk_data["content"]] for chunk_data in batch]
             
-            # Create chunk record
-            chunk = DocumentChunk(
-                document_id=document.id,
-                chunk_index=chunk_data["chunk_index"],
-                content=content,
-                token_count=chunk_data["token_count"],
-                embedding=embedding,
-                chunk_type=chunk_data["chunk_type"],
-                page_number=chunk_data.get("page_number"),
-                section_title=chunk_data.get("section_title"),
-                chunk_metadata=chunk_data.get("chunk_metadata"),
-                possibly_questions=possibly_questions,
-                possibly_question_embedding=possibly_question_embedding,
+            # Embed the combined questions of the whole batch together
+            asked = [j for j, questions in enumerate(batch_questions) if questions]
+            question_embeddings = [None] * len(batch)
+            vectors = await asyncio.gather(
+                *(embedding_batcher.submit(" ".join(batch_questions[j])) for j in asked)
             )
-            self.db.add(chunk)
+            for j, vector in zip(asked, vectors):
+                question_embeddings[j] = vector
+            
+            for chunk_data, embedding, possibly_questions, possibly_question_embedding in zip(
+                batch, embeddings, batch_questions, question_embeddings
+            ):
+                # Collect chunk row
+                rows.append({
+                    "document_id": document.id,
+                    "chunk_index": chunk_data["chunk_index"],
+                    "content": chunk_data["content"],
+                    "token_count": chunk_data["token_count"],
+                    "embedding": embedding,
+                    "chunk_type": chunk_data["chunk_type"],
+                    "page_number": chunk_data.get("page_number"),
+                    "section_title": chunk_data.get("section_title"),
+                    "chunk_metadata": chunk_data.get("chunk_metadata"),
+                    "possibly_questions": possibly_questions,
+                    "possibly_question_embedding": possibly_question_embedding,
+                })
+        
+        # Save all chunks with a single multi-row INSERT
+        if rows:
+            self.db.execute(insert(DocumentChunk), rows)
+    
+    async def warm_embeddings(self, chunks: List[Dict[str, Any]]) -> None:
+        """
+        Embed chunk contents ahead of process_chunks(); the vectors land in the
+        embedding caches. Failures are only logged, the chunks are then
+        embedded by process_chunks() as usual.
+        """
+        try:
+            await self._embed_contents([chunk["content"] for chunk in chunks])
+        except Exception as e:
+            logger.warning("Embedding prefetch failed, chunks will be embedded later: %s", e)
+    
+    async def _embed_contents(self, contents: List[str]) -> List[Optional[list]]:
+        """
+        Embed chunk contents, looking them up in the embedding cache table first.
+        Only misses are sent to the embedding model; new vectors are stored.
+        The cache is read and written from a worker thread in short sessions of
+        its own, outside the document's transaction; any cache failure only
+        means more chunks are embedded (or fewer vectors cached).
+        """
+        model = settings.OLLAMA_EMBEDDING_MODEL
+        keys = [hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest() for content in contents]
+        
+        cached = await asyncio.to_thread(_load_cached_embeddings, model, set(keys))
+        
+        # Embed misses (merged with other documents' chunks by the shared batcher)
+        misses = {key: content for key, content in zip(keys, contents) if key not in cached}
+        new_embeddings = await asyncio.gather(
+            *(embedding_batcher.submit(content) for content in misses.values())
+        )
+        fresh = {key: emb for key, emb in zip(misses, new_embeddings) if emb is not None}
+        
+        if fresh:
+            await asyncio.to_thread(_store_cached_embeddings, model, fresh)
+        
+        return [cached.get(key, fresh.get(key)) for key in keys]
+
+
+def _load_cached_embeddings(model: str, keys: set) -> Dict[bytes, list]:
+    """Look up cached embeddings by content hash. Returns {} if the cache is unavailable."""
+    db = SessionLocal()
+    try:
+        return dict(
+            db.query(EmbeddingCache.content_hash, EmbeddingCache.embedding)
+            .filter(EmbeddingCache.model == model, EmbeddingCache.content_hash.in_(keys))
+            .all()
+        )
+    except Exception as e:
+        logger.warning("Embedding cache lookup failed, embedding all chunks: %s", e)
+        return {}
+    finally:
+        db.close()
+
+
+def _store_cached_embeddings(model: str, embeddings: Dict[bytes, list]) -> None:
+    """
+    Insert new embeddings into the cache table in a separate, immediately
+    committed session. The document session keeps its transaction open until
+    the whole document is processed; writing cache rows there would make
+    concurrent uploads sharing a chunk wait on each other's uncommitted rows.
+    A write that still hits a contended row gives up after the lock timeout.
+    """
+    db = SessionLocal()
+    try:
+        db.execute(text(f"SET LOCAL lock_timeout = '{EMBEDDING_CACHE_LOCK_TIMEOUT}'"))
+        db.execute(
+            pg_insert(EmbeddingCache)
+            .values([
+                {"content_hash": key, "model": model, "embedding": emb}
+                # Sorted so concurrent writers take row locks in the same order
+                for key, emb in sorted(embeddings.items())
+            ])
+            .on_conflict_do_nothing(index_elements=["content_hash", "model"])
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning("Embedding cache update failed: %s", e)
+    finally:
+        db.close()
 
 
 # =============================================================================
@@ -774,8 +1079,8 @@ class DocumentService:
     
     def __init__(self, db: Session):
         self.db = db
-        self.storage = MinIOStorage()
-        self.chunker = TextChunker()           # Legacy fallback
+        self.storage = get_storage()
+        self.chunker = get_text_chunker()      # Legacy fallback
         self.smart_chunker = SmartChunker()     # Primary: smart chunking
         self.chunk_processor = ChunkProcessor(db)
     
@@ -798,25 +1103,45 @@ class DocumentService:
         """
         # Step 1: Validate
         FileValidator.validate_pdf(file)
-        file_content = await file.read()
-        FileValidator.validate_size(file_content)
+        FileValidator.validate_upload_size(file)
+        file_content, file_hash = await FileValidator.validate_and_read(file)
         
-        # Step 2: Upload to storage
+        # Same PDF already processed: skip storage, GROBID and embedding
+        existing = self.db.query(Document).filter(Document.file_hash == file_hash).first()
+        if existing:
+            # Never hand back a record with another visibility or type (e.g. a
+            # public copy for a private upload); its DOI is unique, so a second
+            # record with the requested settings cannot be created either
+            if existing.is_private != is_private or existing.type != document_type:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"This file was already uploaded with a different visibility or document type (id={existing.id})"
+                )
+            logger.info("Document already exists with same content (id=%s), skipping processing", existing.id)
+            if progress_callback:
+                await progress_callback(100, "Document already exists!")
+            return existing
+        
+        # Step 2: Upload to storage (streamed from the spooled upload file)
         if progress_callback:
             await progress_callback(10, "Uploading document to storage...")
-        file_path = self.storage.upload_file(file_content, file.filename)
+        await file.seek(0)
+        file_path = await asyncio.to_thread(
+            self.storage.upload_stream, file.file, len(file_content), file.filename
+        )
         
         try:
             # Step 3: Extract metadata
             if progress_callback:
                 await progress_callback(30, "Extracting metadata with GROBID...")
             
-            metadata = await self._extract_metadata(file_content, progress_callback)
+            metadata, body_chunks = await self._extract_metadata(file_content, progress_callback, file_hash)
             
             # Step 4: Create document record
             document = DocumentBuilder.build_from_metadata(
                 metadata, file_path, document_type, is_private
             )
+            document.file_hash = file_hash
             self.db.add(document)
             self.db.flush()
             
@@ -824,7 +1149,8 @@ class DocumentService:
             if progress_callback:
                 await progress_callback(60, "Processing content chunks...")
             
-            chunks = self._prepare_chunks(metadata)
+            # Body chunks were built during metadata extraction
+            chunks = self._assemble_chunks(metadata, body_chunks)
             await self.chunk_processor.process_chunks(document, chunks, progress_callback)
             
             # Commit and finish
@@ -843,59 +1169,83 @@ class DocumentService:
             self.storage.delete_file(file_path)
             raise HTTPException(status_code=500, detail=f"Document processing failed: {str(e)}")
     
-    async def _extract_metadata(self, file_content: bytes, progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
-        """Extract and format metadata from PDF using GROBID + LLM fallback."""
-        # Step 1: Extract with GROBID
-        header = await extract_header(file_content)
-        references = extract_references(file_content)
-        fulltext = extract_fulltext(file_content)
-        
-        # Step 1b: Extract structured sections for smart chunking
-        structured_sections = []
-        try:
-            if progress_callback:
-                await progress_callback(35, "Extracting document structure for smart chunking...")
-            structured_sections = extract_structured_fulltext(file_content)
-            print(f"Extracted {len(structured_sections)} structured sections for smart chunking")
-        except Exception as e:
-            print(f"Structured extraction failed, will use legacy chunking: {e}")
+    async def _extract_metadata(
+        self,
+        file_content: bytes,
+        progress_callback: Optional[Callable] = None,
+        file_hash: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Extract and format metadata from PDF using GROBID + LLM fallback.
+        Returns (metadata, body_chunks); body chunking only needs GROBID output,
+        so it runs while the LLM fallback is in flight.
+        """
+        if progress_callback:
+            await progress_callback(35, "Extracting document structure for smart chunking...")
+        
+        cached = _extraction_cache.get(file_hash) if file_hash else None
+        if cached:
+            _extraction_cache.move_to_end(file_hash)
+            header, references, fulltext, structured_sections, raw_pdf_text, self._pages_data = cached
+            logger.info("Using cached GROBID/PyMuPDF extraction for this file")
+        else:
+            # Step 1: Extract with GROBID. Fulltext, references and structured
+            # sections for smart chunking all come from one processFulltextDocument
+            # call, running alongside the header request.
+            # Step 2 runs alongside: raw PDF text for LLM (includes title page)
+            header, (fulltext, references, structured_sections), raw_pdf_text = await asyncio.gather(
+                extract_header(file_content),
+                extract_fulltext_document_async(file_content),
+                asyncio.to_thread(self._extract_raw_pdf_text, file_content),
+            )
+            logger.info("Extracted %d structured sections for smart chunking", len(structured_sections))
+            if file_hash:
+                _extraction_cache[file_hash] = (
+                    header, references, fulltext, structured_sections, raw_pdf_text, self._pages_data
+                )
+                if len(_extraction_cache) > EXTRACTION_CACHE_SIZE:
+                    _extraction_cache.popitem(last=False)
         
         metadata = format_for_database(header, references)
         metadata["fulltext"] = fulltext or ""
         metadata["structured_sections"] = structured_sections
         
-        # Step 2: Extract raw PDF text for LLM (includes title page)
-        raw_pdf_text = self._extract_raw_pdf_text(file_content)
-        
         # Step 3: Check if metadata is incomplete and use LLM fallback
         if is_metadata_incomplete(metadata):
-            print("Metadata incomplete from GROBID, using LLM fallback...")
+            logger.info("Metadata incomplete from GROBID, using LLM fallback")
             if progress_callback:
                 await progress_callback(45, "Extracting metadata with LLM (GROBID incomplete)...")
             
             # Use raw PDF text for LLM (not GROBID fulltext) to ensure title page is included
             llm_input_text = raw_pdf_text if raw_pdf_text else (fulltext or "")
-            # print('=============llm_input_text============')
-            # print(llm_input_text)
-            # print('====================================')
-            # print('=============fulltext============')
-            # print(fulltext)
-            # print('=============raw_pdf_text============')
-            # print(raw_pdf_text)
+            llm_task = asyncio.create_task(extract_metadata_with_llm(llm_input_text, metadata))
+            
+            # Body chunks don't depend on the LLM result: chunk and embed them
+            # while the LLM call is in flight so process_chunks finds them cached
             try:
-                llm_metadata = await extract_metadata_with_llm(llm_input_text, metadata)
+                body_chunks = await asyncio.to_thread(self._prepare_body_chunks, metadata)
+            except BaseException:
+                llm_task.cancel()
+                raise
+            await self.chunk_processor.warm_embeddings(body_chunks)
+            
+            try:
+                llm_metadata = await llm_task
                 if llm_metadata:
                     metadata = merge_metadata(metadata, llm_metadata)
-                    print("LLM metadata merge complete")
+                    logger.info("LLM metadata merge complete")
             except Exception as e:
-                print(f"LLM metadata extraction failed: {str(e)}")
+                logger.warning("LLM metadata extraction failed: %s", e)
                 # Continue with GROBID metadata only
+        else:
+            # Chunking is CPU-bound; keep it off the event loop
+            body_chunks = await asyncio.to_thread(self._prepare_body_chunks, metadata)
         
         # Step 4: Final validation - ensure critical fields are never empty
         raw_text_for_fallback = raw_pdf_text if raw_pdf_text else (fulltext or "")
         metadata = self._validate_metadata(metadata, raw_text_for_fallback)
         
-        return metadata
+        return metadata, body_chunks
     
     def _extract_raw_pdf_text(self, file_content: bytes) -> str:
         """
@@ -904,39 +1254,42 @@ class DocumentService:
         This ensures the title page (page 1) is always included.
         Also populates self._pages_data for page-number resolution.
         """
-        # Try both import names (pymupdf for v1.25+, fitz for older)
-        pymupdf = None
-        try:
-            import pymupdf as pymupdf
-        except ImportError:
-            try:
-                import fitz as pymupdf
-            except ImportError:
-                raise HTTPException(
-                    status_code=500,
-                    detail="PyMuPDF is not installed. Run: pip install PyMuPDF"
-                )
+        if pymupdf is None:
+            raise HTTPException(
+                status_code=500,
+                detail="PyMuPDF is not installed. Run: pip install PyMuPDF"
+            )
         
         try:
-            doc = pymupdf.open(stream=file_content, filetype="pdf")
             pages_text = []
             self._pages_data = []  # Per-page data for page-number resolution
             
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text("text")
-                if text and text.strip():
-                    pages_text.append(text.strip())
-                    self._pages_data.append({
-                        "page_number": page_num + 1,  # 1-based
-                        "text": text.strip()
-                    })
+            # Plain text only: keep whitespace, clip to the page, and let
+            # ligatures (e.g. "ﬁ") expand to normal letters like GROBID's text
+            text_flags = pymupdf.TEXT_PRESERVE_WHITESPACE | pymupdf.TEXT_MEDIABOX_CLIP
             
-            doc.close()
+            with _pymupdf_lock:
+                try:
+                    with pymupdf.open(stream=file_content, filetype="pdf") as doc:
+                        # Pages are read sequentially: a PyMuPDF Document must not be
+                        # shared between threads, and PDFs here are typically short
+                        for page_num, page in enumerate(doc):
+                            text = page.get_text("text", flags=text_flags).strip()
+                            if text:
+                                pages_text.append(text)
+                                self._pages_data.append({
+                                    "page_number": page_num + 1,  # 1-based
+                                    "text": text
+                                })
+                finally:
+                    # Empty MuPDF's global object store so a long-running
+                    # worker doesn't keep growing across documents
+                    pymupdf.TOOLS.store_shrink(100)
             
             raw_text = "\n\n".join(pages_text)
-            print(f"  PyMuPDF: Extracted {len(raw_text)} chars from {len(pages_text)} pages")
-            print(f"  PyMuPDF first 200 chars: {raw_text[:200]}")
+            logger.info("PyMuPDF: Extracted %d chars from %d pages", len(raw_text), len(pages_text))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("PyMuPDF first 200 chars: %s", raw_text[:200])
             return raw_text
             
         except HTTPException:
@@ -954,16 +1307,19 @@ class DocumentService:
         """
         # Title: MUST exist
         title = metadata.get("title")
-        if not title or title.strip() == "" or title.strip().lower() in ["untitled", "untitled document"]:
+        stripped_title = title.strip() if title else ""
+        if not stripped_title or stripped_title.lower() in ("untitled", "untitled document"):
             # Last resort: derive from first line of fulltext
             if fulltext:
                 first_line = fulltext.strip().split('\n')[0][:150].strip()
                 if first_line and len(first_line) > 10:
                     metadata["title"] = first_line
-                    print(f"  Fallback title from first line: {first_line[:80]}")
+                    logger.info("Fallback title from first line: %s", first_line[:80])
                 else:
-                    metadata["title"] = f"Document-{hash(fulltext[:500]) % 100000}"
-                    print(f"  Fallback title from hash: {metadata['title']}")
+                    # Stable across restarts (builtin hash() is randomized per process)
+                    digest = hashlib.blake2b(fulltext[:500].encode("utf-8"), digest_size=8).digest()
+                    metadata["title"] = f"Document-{int.from_bytes(digest, 'big') % 100000}"
+                    logger.info("Fallback title from hash: %s", metadata["title"])
             else:
                 metadata["title"] = "Document tanpa judul"
         
@@ -974,38 +1330,39 @@ class DocumentService:
             keywords = [w for w in title_words if len(w) > 3][:5]
             if keywords:
                 metadata["keywords"] = ", ".join(keywords)
-                print(f"  Fallback keywords from title: {metadata['keywords']}")
+                logger.info("Fallback keywords from title: %s", metadata["keywords"])
         
         # Language: default to Indonesian if empty
         if not metadata.get("language"):
             metadata["language"] = "id"
-            print("  Fallback language: id")
+            logger.info("Fallback language: id")
         
         # Description: generate from abstract or content
         if not metadata.get("description") and metadata.get("abstract"):
             metadata["description"] = metadata["abstract"][:200]
-            print("  Fallback description from abstract")
+            logger.info("Fallback description from abstract")
         
         # Parse date string from LLM if it's a string
         if isinstance(metadata.get("date"), str):
-            from datetime import datetime
             date_str = metadata["date"]
             parsed = None
-            for fmt in ["%Y-%m-%d", "%Y-%m", "%Y", "%d %B %Y", "%B %Y"]:
-                try:
-                    parsed = datetime.strptime(date_str, fmt).date()
+            for pattern, fmt in _DATE_FORMATS:
+                if pattern.fullmatch(date_str):
+                    try:
+                        parsed = datetime.strptime(date_str, fmt).date()
+                    except ValueError:
+                        pass
                     break
-                except ValueError:
-                    continue
             metadata["date"] = parsed
         
-        print(f"  Final metadata validation complete. Title: {str(metadata.get('title', ''))[:80]}")
+        logger.info("Final metadata validation complete. Title: %.80s", metadata.get("title", ""))
         return metadata
     
-    def _prepare_chunks(self, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _prepare_body_chunks(self, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
-        Prepare all chunks using smart chunking (paragraph/section-aware).
+        Chunk the document body using smart chunking (paragraph/section-aware).
         Falls back to legacy fixed-size chunking if structured extraction failed.
+        Uses only GROBID output, so it can run before the LLM metadata merge.
         
         Smart chunking ensures:
         - Chunks respect paragraph and section boundaries
@@ -1017,7 +1374,7 @@ class DocumentService:
         
         if structured_sections:
             # === PRIMARY: Smart chunking from structured sections ===
-            print("Using SMART CHUNKING (section & paragraph-aware)")
+            logger.info("Using SMART CHUNKING (section & paragraph-aware)")
             pages_data = getattr(self, '_pages_data', None)
             chunks = self.smart_chunker.chunk_structured_sections(
                 sections=structured_sections,
@@ -1026,35 +1383,49 @@ class DocumentService:
             )
             
             if chunks:
-                print(f"Smart chunking produced {len(chunks)} chunks")
+                logger.info("Smart chunking produced %d chunks", len(chunks))
                 return chunks
             else:
-                print("Smart chunking produced 0 chunks, falling back to legacy")
+                logger.info("Smart chunking produced 0 chunks, falling back to legacy")
         
         # === FALLBACK: Legacy fixed-size chunking ===
-        print("Using LEGACY CHUNKING (fixed word-count)")
-        chunks = self.chunker.chunk_text(
+        logger.info("Using LEGACY CHUNKING (fixed word-count)")
+        return self.chunker.chunk_text(
             metadata.get("fulltext", ""),
-            document_title=metadata["title"]
+            document_title=metadata.get("title")
         )
+    
+    @staticmethod
+    def _assemble_chunks(metadata: Dict[str, Any], body_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Finish body chunks with the final (merged and validated) metadata.
+        Smart chunks already contain the TEI title/abstract sections; legacy
+        chunks get title and abstract chunks built from the final metadata.
+        """
+        title = metadata["title"]
+        for chunk in body_chunks:
+            chunk["chunk_metadata"]["source_document"] = title
         
-        # Add abstract chunk
-        if metadata.get("abstract"):
-            abstract_chunk = TextChunker.create_abstract_chunk(
-                metadata["abstract"],
-                metadata["title"]
-            )
-            chunks.insert(0, abstract_chunk)
-            TextChunker.reindex_chunks(chunks)
+        if body_chunks and body_chunks[0]["chunk_metadata"].get("chunk_strategy") == "smart":
+            return body_chunks
         
-        # Add title chunk
-        if metadata.get("title"):
-            title_chunk = TextChunker.create_title_chunk(
-                metadata["title"],
+        # Title and abstract chunks go in front of the body chunks
+        special_chunks = []
+        if title:
+            special_chunks.append(TextChunker.create_title_chunk(
+                title,
                 metadata.get("creator"),
                 metadata.get("doi")
-            )
-            chunks.insert(0, title_chunk)
+            ))
+        if metadata.get("abstract"):
+            special_chunks.append(TextChunker.create_abstract_chunk(
+                metadata["abstract"],
+                title
+            ))
+        
+        chunks = body_chunks
+        if special_chunks:
+            chunks = special_chunks + body_chunks
             TextChunker.reindex_chunks(chunks)
         
         return chunks
@@ -1078,30 +1449,30 @@ async def process_document(
 
 def get_document_download_url(file_path: str) -> str:
     """Get presigned URL for downloading a document."""
-    storage = MinIOStorage()
+    storage = get_storage()
     return storage.get_download_url(file_path)
 
 
 def delete_document_file(file_path: str) -> bool:
     """Delete document file from MinIO."""
-    storage = MinIOStorage()
+    storage = get_storage()
     return storage.delete_file(file_path)
 
 
 # Legacy function exports
 def ensure_documents_bucket_exists(client) -> None:
     """Legacy: Create documents bucket if it doesn't exist."""
-    storage = MinIOStorage()
+    storage = get_storage()
     storage.ensure_bucket_exists()
 
 
 async def upload_pdf_to_minio(file_content: bytes, original_filename: str) -> str:
     """Legacy: Upload PDF to MinIO."""
-    storage = MinIOStorage()
+    storage = get_storage()
     return storage.upload_file(file_content, original_filename)
 
 
 def chunk_text(text: str, chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP, document_title: str = None) -> list[dict]:
     """Legacy: Split text into chunks."""
-    chunker = TextChunker(chunk_size, overlap)
+    chunker = get_text_chunker(chunk_size, overlap)
     return chunker.chunk_text(text, document_title)
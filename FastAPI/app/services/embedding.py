@@ -1,12 +1,57 @@
 """Embedding service using Ollama with nomic-embed-text model."""
+import asyncio
+import hashlib
+import logging
+import random
 import requests
+import threading
 import time
-import google.generativeai as genai
+from collections import OrderedDict
 from typing import Optional
 from app.config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
+# In-process LRU cache of embeddings, keyed by a digest of the (prepared) text
+EMBEDDING_CACHE_SIZE = 10000
+_embedding_cache: "OrderedDict[bytes, list[float]]" = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+# Retries for transient Ollama failures (overloaded, busy loading a model)
+RETRYABLE_STATUS = {429, 502, 503, 504}
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 16.0
+# Out-of-memory errors take longer to clear (Ollama has to unload a model), so
+# their backoff starts this many doubling steps later (4x the base delay)
+MEMORY_ERROR_BACKOFF_STEPS = 2
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for the given 0-based attempt."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _cache_key(text: str) -> bytes:
+    """Short digest of the text so the cache doesn't hold full chunk strings."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _cache_get(key: bytes) -> Optional[list[float]]:
+    with _embedding_cache_lock:
+        embedding = _embedding_cache.get(key)
+        if embedding is not None:
+            _embedding_cache.move_to_end(key)
+        return embedding
+
+
+def _cache_put(key: bytes, embedding: list[float]) -> None:
+    with _embedding_cache_lock:
+        _embedding_cache[key] = embedding
+        _embedding_cache.move_to_end(key)
+        if len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
 
 
 def generate_embedding(text: str, max_retries: int = 3) -> Optional[list[float]]:
@@ -22,6 +67,11 @@ def generate_embedding(text: str, max_retries: int = 3) -> Optional[list[float]]
     # Truncate text if too long (nomic-embed-text has context limit)
     text = text.strip()[:8000]  # Keep first 8000 chars
     
+    key = _cache_key(text)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+    
     url = f"{settings.OLLAMA_BASE_URL}/api/embeddings"
     payload = {
         "model": settings.OLLAMA_EMBEDDING_MODEL,
@@ -37,77 +87,171 @@ def generate_embedding(text: str, max_retries: int = 3) -> Optional[list[float]]
                 data = response.json()
                 embedding = data.get("embedding")
                 if embedding:
+                    _cache_put(key, embedding)
                     return embedding
-                print("No embedding in response")
+                logger.warning("No embedding in response")
                 return None
+            elif response.status_code in RETRYABLE_STATUS and attempt < max_retries - 1:
+                logger.warning("Ollama busy (%d), retrying (attempt %d/%d)", response.status_code, attempt + 1, max_retries)
+                time.sleep(_backoff_delay(attempt))
+                continue
             elif response.status_code == 500:
                 error_text = response.text[:200]
                 if "memory" in error_text.lower():
-                    print(f"Ollama memory error (attempt {attempt + 1}/{max_retries}): {error_text}")
-                    # Wait before retry
-                    time.sleep(2)
+                    logger.warning("Ollama memory error (attempt %d/%d): %s", attempt + 1, max_retries, error_text)
+                    time.sleep(_backoff_delay(attempt + MEMORY_ERROR_BACKOFF_STEPS))
                     continue
                 else:
-                    print(f"Ollama server error: {error_text}")
+                    logger.error("Ollama server error: %s", error_text)
                     return None
             else:
-                print(f"Embedding generation failed: {response.status_code}")
+                logger.error("Embedding generation failed: %d", response.status_code)
                 return None
                 
         except requests.exceptions.ConnectionError:
-            print("Cannot connect to Ollama. Make sure Ollama is running.")
+            logger.error("Cannot connect to Ollama. Make sure Ollama is running.")
             return None
         except requests.exceptions.Timeout:
-            print(f"Ollama request timed out (attempt {attempt + 1}/{max_retries})")
+            logger.warning("Ollama request timed out (attempt %d/%d)", attempt + 1, max_retries)
             if attempt < max_retries - 1:
-                time.sleep(1)
+                time.sleep(_backoff_delay(attempt))
                 continue
             return None
         except Exception as e:
-            print(f"Embedding error: {str(e)}")
+            logger.error("Embedding error: %s", e)
             return None
     
     return None
 
 
-def generate_embeddings_batch(texts: list[str]) -> list[Optional[list[float]]]:
+def generate_embeddings_batch(
+    texts: list[str], batch_size: int = 32, max_retries: int = 3
+) -> list[Optional[list[float]]]:
     """
     Generate embeddings for multiple texts.
-    Returns list of embeddings (some may be None if failed).
+    Sends up to `batch_size` texts per request to Ollama's /api/embed endpoint.
+    Transient failures are retried per batch with exponential backoff; after
+    that it falls back to one request per text. Repeated texts and texts
+    already in the cache are not sent again.
+    Returns list of embeddings aligned with `texts` (some may be None if failed).
     """
-    return [generate_embedding(text) for text in texts]
+    embeddings: list[Optional[list[float]]] = [None] * len(texts)
+    
+    # Same input rules as generate_embedding(): skip empty, truncate long text.
+    # Positions sharing the same text are grouped so each is embedded once.
+    positions: dict[bytes, list[int]] = {}
+    pending: list[tuple[bytes, str]] = []
+    for i, text in enumerate(texts):
+        if not text or not text.strip():
+            continue
+        text = text.strip()[:8000]
+        key = _cache_key(text)
+        if key in positions:
+            positions[key].append(i)
+            continue
+        cached = _cache_get(key)
+        if cached is not None:
+            embeddings[i] = cached
+            continue
+        positions[key] = [i]
+        pending.append((key, text))
+    
+    # Longest first, so texts in the same request have similar lengths (less padding)
+    pending.sort(key=lambda item: len(item[1]), reverse=True)
+    
+    url = f"{settings.OLLAMA_BASE_URL}/api/embed"
+    
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        payload = {
+            "model": settings.OLLAMA_EMBEDDING_MODEL,
+            "input": [text for _, text in batch]
+        }
+        
+        vectors = None
+        for attempt in range(max_retries):
+            try:
+                response = requests.post(url, json=payload, timeout=120)
+                if response.status_code == 200:
+                    vectors = response.json().get("embeddings") or []
+                    break
+                if response.status_code not in RETRYABLE_STATUS:
+                    logger.warning("Batch embedding failed (%d)", response.status_code)
+                    break
+                logger.warning("Ollama busy (%d), retrying batch (attempt %d/%d)", response.status_code, attempt + 1, max_retries)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                logger.warning("Batch embedding error (attempt %d/%d): %s", attempt + 1, max_retries, e)
+            except requests.exceptions.RequestException as e:
+                logger.warning("Batch embedding error: %s", e)
+                break
+            if attempt < max_retries - 1:
+                time.sleep(_backoff_delay(attempt))
+        
+        if vectors is not None and len(vectors) == len(batch):
+            for (key, _), vector in zip(batch, vectors):
+                _cache_put(key, vector)
+                for i in positions[key]:
+                    embeddings[i] = vector
+            continue
+        
+        logger.info("Retrying batch texts one by one")
+        for key, text in batch:
+            vector = generate_embedding(text)
+            for i in positions[key]:
+                embeddings[i] = vector
+    
+    return embeddings
 
 
-def generate_embedding_test(text: str) -> Optional[list[float]]:
+class EmbeddingBatcher:
     """
-    Generate embedding for text using Google Generative AI (Gemini).
-    Returns 768-dimensional embedding vector or None if failed.
+    Collects embedding requests from concurrent callers (e.g. several documents
+    being processed at once) and sends them to Ollama together, so small
+    per-document batches are merged into fuller ones.
     """
-    api_key = settings.GOOGLE_API_KEY or settings.GEMINI_API_KEY
-    if not api_key:
-        print("GOOGLE_API_KEY or GEMINI_API_KEY not set")
-        return None
-
-    if not text or not text.strip():
-        return None
-
-    try:
-        genai.configure(api_key=api_key)
-        
-        result = genai.embed_content(
-            model=settings.GOOGLE_EMBEDDING_MODEL,
-            content=text,
-            task_type="retrieval_document",
-            title=None,
-            output_dimensionality=768
-        )
-        
-        embedding = result.get('embedding')
-        if embedding:
-            return embedding
-        return None
+    
+    def __init__(self, max_batch: int = 64, max_wait_ms: int = 50):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    async def submit(self, text: str) -> Optional[list[float]]:
+        """Queue text for embedding and wait for its vector (None if failed)."""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
         
-    except Exception as e:
-        print(f"Google embedding error: {str(e)}")
-        return None
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+    
+    async def _run(self) -> None:
+        """Drain the queue: wait up to max_wait for a batch to fill, then embed it."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                embeddings = await asyncio.to_thread(
+                    generate_embeddings_batch, [text for text, _ in batch], self.max_batch
+                )
+            except Exception as e:
+                logger.error("Batched embedding error: %s", e)
+                embeddings = [None] * len(batch)
+            
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+
 
+embedding_batcher = EmbeddingBatcher()
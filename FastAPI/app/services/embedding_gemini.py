@@ -0,0 +1,38 @@
+"""Embedding service using Google Generative AI (Gemini), kept apart from the Ollama path."""
+import google.generativeai as genai
+from typing import Optional
+from app.config import get_settings
+from app.services.gemini import configure_gemini
+
+settings = get_settings()
+
+
+def generate_embedding_test(text: str) -> Optional[list[float]]:
+    """
+    Generate embedding for text using Google Generative AI (Gemini).
+    Returns 768-dimensional embedding vector or None if failed.
+    """
+    if not configure_gemini():
+        print("GOOGLE_API_KEY or GEMINI_API_KEY not set")
+        return None
+
+    if not text or not text.strip():
+        return None
+
+    try:
+        result = genai.embed_content(
+            model=settings.GOOGLE_EMBEDDING_MODEL,
+            content=text,
+            task_type="retrieval_document",
+            title=None,
+            output_dimensionality=768
+        )
+        
+        embedding = result.get('embedding')
+        if embedding:
+            return embedding
+        return None
+        
+    except Exception as e:
+        print(f"Google embedding error: {str(e)}")
+        return None
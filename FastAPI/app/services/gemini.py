@@ -0,0 +1,19 @@
+"""Shared Google Generative AI (Gemini) client setup."""
+from functools import lru_cache
+from typing import Optional
+import google.generativeai as genai
+from app.config import get_settings
+
+settings = get_settings()
+
+
+@lru_cache()
+def configure_gemini() -> Optional[str]:
+    """
+    Configure the Gemini SDK once per process (genai.configure sets
+    module-global state). Returns the API key, or None if none is set.
+    """
+    api_key = settings.GOOGLE_API_KEY or settings.GEMINI_API_KEY
+    if api_key:
+        genai.configure(api_key=api_key)
+    return api_key or None
@@ -1,42 +1,136 @@
 """GROBID service for PDF metadata extraction."""
-import requests
+import asyncio
+import logging
+import httpx
 from lxml import etree
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Callable
 from fastapi import HTTPException
 from app.config import get_settings
 import sys
 from app.services.llm import generate_response
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 
+# TEI XPath expressions, compiled once at import instead of on every call
+_TEI_NS = {"tei": "http://www.tei-c.org/ns/1.0"}
+
+
+def _xp(path: str) -> etree.XPath:
+    return etree.XPath(path, namespaces=_TEI_NS)
+
+
+# Title candidates (main/untyped/any titleStmt title, article title, analytic
+# title) unioned into one expression. A union yields document order, which for
+# GROBID TEI matches the old priority: titleStmt precedes sourceDesc, and the
+# header precedes the body. The first candidate with more than 3 characters wins.
+# The header variant also falls back to section heads and selects text nodes;
+# the fulltext/structured variant selects elements (for nested markup).
+_XP_HEADER_TITLE = _xp(
+    "((//tei:titleStmt/tei:title | //tei:sourceDesc//tei:title[@level='a']"
+    " | //tei:analytic/tei:title | //tei:head)/text()"
+    "[string-length(normalize-space(.)) > 3])[1]"
+)
+_XP_TITLE = _xp(
+    "(//tei:titleStmt/tei:title | //tei:sourceDesc//tei:title[@level='a']"
+    " | //tei:analytic/tei:title)[string-length(normalize-space(string(.))) > 3][1]"
+)
+_XP_FIRST_BODY_HEAD = _xp("//tei:body//tei:head[1]/text()")
+_XP_AUTHORS = _xp("//tei:author/tei:persName")
+_XP_FORENAME = _xp("tei:forename/text()")
+_XP_SURNAME = _xp("tei:surname/text()")
+_XP_DOI = _xp("//tei:idno[@type='DOI']/text()")
+_XP_PUBLISHED_DATE = _xp("//tei:date[@type='published']/@when")
+_XP_DATE_TEXT = _xp("//tei:date/text()")
+_XP_PUBLISHER = _xp("//tei:publicationStmt/tei:publisher/text()")
+_XP_JOURNAL = _xp("//tei:sourceDesc//tei:title[@level='j']/text()")
+_XP_ABSTRACT_TEXT = _xp("//tei:profileDesc/tei:abstract//text()")
+_XP_KEYWORDS = _xp("//tei:keywords//tei:term/text()")
+_XP_IDNO = _xp("//tei:idno/text()")
+_XP_AVAILABILITY_STATUS = _xp("//tei:availability/@status")
+_XP_LICENCE_TARGET = _xp("//tei:availability//tei:licence/@target")
+_XP_AVAILABILITY_TEXT = _xp("//tei:availability//tei:p/text()")
+_XP_BODY_BLOCKS = _xp("//tei:body//tei:head | //tei:body//tei:p")
+_XP_REFERENCE_TITLES = _xp("//tei:listBibl//tei:title/text()")
+_XP_BODY = _xp("//tei:body")
+_XP_DIV = _xp("tei:div")
+_XP_HEAD = _xp("tei:head")
+_XP_P = _xp("tei:p")
+_XP_HEAD_OR_P = _xp("tei:head | tei:p")
+_XP_BIBL_STRUCTS = _xp("//tei:listBibl//tei:biblStruct")
+_XP_BIBL_AUTHORS = _xp(".//tei:author/tei:persName")
+_XP_BIBL_TITLE = _xp(".//tei:title/text()")
+_XP_BIBL_DATE = _xp(".//tei:date/@when")
+
+
+# Shared keep-alive client for all GROBID calls. Its pool caps in-flight
+# requests across all uploads (GROBID's own pool is org.grobid.max.connections);
+# extra callers wait (up to the request timeout) for a free connection.
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    """Get the shared GROBID AsyncClient (created on first use)."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            base_url=settings.GROBID_URL,
+            limits=httpx.Limits(
+                max_connections=settings.GROBID_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GROBID_MAX_CONNECTIONS,
+            ),
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    """Close the shared GROBID client (called on application shutdown)."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+async def _post_async(
+    path: str, file_bytes: bytes, timeout: float, data: Optional[dict] = None
+) -> httpx.Response:
+    """POST a PDF to a GROBID endpoint over the shared keep-alive client."""
+    return await _get_async_client().post(
+        path,
+        files={'input': ("document.pdf", file_bytes)},
+        data=data,
+        headers={'Accept': 'application/xml'},
+        # Waiting for a free pooled connection is bounded too, so a hung GROBID
+        # surfaces as a 504 instead of stalling every upload
+        timeout=httpx.Timeout(timeout),
+    )
+
 
 async def extract_header(file_bytes: bytes) -> dict:
     """
     Extract header/metadata from PDF using GROBID processHeaderDocument endpoint.
     Returns Dublin Core compatible metadata.
     """
-    url = f"{settings.GROBID_URL}/api/processHeaderDocument"
-    
     try:
-        response = requests.post(
-            url,
-            files={'input': ("document.pdf", file_bytes)},
+        response = await _post_async(
+            "/api/processHeaderDocument",
+            file_bytes,
+            timeout=60,
             data={'consolidateHeader': '1'},
-            headers={'Accept': 'application/xml'},
-            timeout=60
         )
 
-    except requests.exceptions.ConnectionError:
-        raise HTTPException(
-            status_code=503,
-            detail="GROBID service is not available. Please ensure GROBID is running."
-        )
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         raise HTTPException(
             status_code=504,
             detail="GROBID request timed out. The PDF may be too large."
         )
+    except httpx.TransportError:
+        # Refused/reset connections and protocol errors alike
+        raise HTTPException(
+            status_code=503,
+            detail="GROBID service is not available. Please ensure GROBID is running."
+        )
     
     if response.status_code != 200:
         raise HTTPException(
@@ -52,78 +146,62 @@ async def extract_header(file_bytes: bytes) -> dict:
             detail=f"Failed to parse GROBID XML response: {str(e)}"
         )
     
-    ns = {"tei": "http://www.tei-c.org/ns/1.0"}
-    
     # Extract title - try multiple XPath locations
     title = None
-    title_xpaths = [
-        "//tei:titleStmt/tei:title[@type='main']/text()",  # Main title
-        "//tei:titleStmt/tei:title[not(@type)]/text()",    # Title without type
-        "//tei:titleStmt/tei:title/text()",                 # Any title in titleStmt
-        "//tei:sourceDesc//tei:title[@level='a']/text()",   # Article title
-        "//tei:analytic/tei:title/text()",                  # Analytic title
-        "//tei:head/text()",                                 # Header text (first one)
-    ]
-    
-    for xpath in title_xpaths:
-        title_nodes = root.xpath(xpath, namespaces=ns)
-        if title_nodes:
-            # Get the first non-empty title
-            for t in title_nodes:
-                cleaned = t.strip() if t else ""
-                if cleaned and len(cleaned) > 3:  # Minimum 4 chars
-                    title = cleaned
-                    print(f"GROBID: Found title via {xpath}: {title[:50]}...")
-                    break
-            if title:
-                break
+    title_nodes = _XP_HEADER_TITLE(root)
+    if title_nodes:
+        title = title_nodes[0].strip()
+        logger.debug("GROBID: Found title: %.50s...", title)
     
     # If still no title, try to extract from first paragraph or heading
     if not title:
-        first_head = root.xpath("//tei:body//tei:head[1]/text()", namespaces=ns)
+        first_head = _XP_FIRST_BODY_HEAD(root)
         if first_head and first_head[0].strip():
             title = first_head[0].strip()
-            print(f"GROBID: Using first heading as title: {title[:50]}...")
+            logger.debug("GROBID: Using first heading as title: %.50s...", title)
     
     # Extract authors
-    authors_xml = root.xpath("//tei:author/tei:persName", namespaces=ns)
+    authors_xml = _XP_AUTHORS(root)
     authors = []
     for author in authors_xml:
-        forename = "".join(author.xpath("tei:forename/text()", namespaces=ns)) or ""
-        surname = "".join(author.xpath("tei:surname/text()", namespaces=ns)) or ""
+        forename = "".join(_XP_FORENAME(author)) or ""
+        surname = "".join(_XP_SURNAME(author)) or ""
         full_name = f"{forename} {surname}".strip()
         if full_name:
             authors.append(full_name)
     
     # Extract other metadata
-    doi_nodes = root.xpath("//tei:idno[@type='DOI']/text()", namespaces=ns)
-    date_nodes = root.xpath("//tei:date[@type='published']/@when", namespaces=ns)
+    doi_nodes = _XP_DOI(root)
+    date_nodes = _XP_PUBLISHED_DATE(root)
     if not date_nodes:
-        date_nodes = root.xpath("//tei:date/text()", namespaces=ns)
-    publisher_nodes = root.xpath("//tei:publicationStmt/tei:publisher/text()", namespaces=ns)
-    journal_nodes = root.xpath("//tei:sourceDesc//tei:title[@level='j']/text()", namespaces=ns)
-    abstract_nodes = root.xpath("//tei:profileDesc/tei:abstract//text()", namespaces=ns)
-    keyword_nodes = root.xpath("//tei:keywords//tei:term/text()", namespaces=ns)
+        date_nodes = _XP_DATE_TEXT(root)
+    publisher_nodes = _XP_PUBLISHER(root)
+    journal_nodes = _XP_JOURNAL(root)
+    abstract_nodes = _XP_ABSTRACT_TEXT(root)
+    keyword_nodes = _XP_KEYWORDS(root)
     
     # Extract identifiers (DOI, arXiv, etc.)
-    all_idno = root.xpath("//tei:idno/text()", namespaces=ns)
+    all_idno = _XP_IDNO(root)
     identifier = doi_nodes[0] if doi_nodes else (all_idno[0].strip() if all_idno else None)
     
     # Extract rights/license
     rights = None
-    license_nodes = root.xpath("//tei:availability/@status", namespaces=ns)
+    license_nodes = _XP_AVAILABILITY_STATUS(root)
     if license_nodes:
         rights = license_nodes[0]
-    license_text = root.xpath("//tei:availability//tei:licence/@target", namespaces=ns)
+    license_text = _XP_LICENCE_TARGET(root)
     if license_text:
         rights = license_text[0]
     if not rights:
-        license_p = root.xpath("//tei:availability//tei:p/text()", namespaces=ns)
+        license_p = _XP_AVAILABILITY_TEXT(root)
         if license_p:
             rights = license_p[0].strip()
     
-    print(f"GROBID: Extracted title = '{title}'")
-    print(f"GROBID: DOI = {doi_nodes[0] if doi_nodes else None}, identifier = {identifier}, rights = {rights}")
+    logger.debug("GROBID: Extracted title = '%s'", title)
+    logger.debug(
+        "GROBID: DOI = %s, identifier = %s, rights = %s",
+        doi_nodes[0] if doi_nodes else None, identifier, rights
+    )
     
     return {
         "title": title,
@@ -139,80 +217,101 @@ async def extract_header(file_bytes: bytes) -> dict:
     }
 
 
-def extract_fulltext(file_bytes: bytes) -> str:
-    """
-    Extract full text from PDF using GROBID processFulltextDocument endpoint.
-    Returns plain text content.
-    """
-    url = f"{settings.GROBID_URL}/api/processFulltextDocument"
-    
+async def _fetch_fulltext_tei_async(file_bytes: bytes) -> Optional[str]:
+    """POST to processFulltextDocument. Returns the TEI XML, or None on a non-200 response."""
     try:
-        response = requests.post(
-            url,
-            files={'input': ("document.pdf", file_bytes)},
-            headers={'Accept': 'application/xml'},
-            timeout=120
+        response = await _post_async("/api/processFulltextDocument", file_bytes, timeout=120)
+    except httpx.TimeoutException:
+        raise HTTPException(
+            status_code=504,
+            detail="GROBID fulltext extraction timed out."
         )
-
-        with open("full_text_grobid.txt", "w", encoding="utf-8") as f:
-            f.write(response.text + "\n")
-            f.write("=====================================\n")
-
-
-
-    except requests.exceptions.ConnectionError:
+    except httpx.TransportError:
+        # Refused/reset connections and protocol errors alike
         raise HTTPException(
             status_code=503,
             detail="GROBID service is not available."
         )
-    except requests.exceptions.Timeout:
-        raise HTTPException(
-            status_code=504,
-            detail="GROBID fulltext extraction timed out."
-        )
     
     if response.status_code != 200:
-        return ""
-    
+        return None
+    return response.text
+
+
+def _parse_tei(tei: Optional[str]):
+    """Parse a processFulltextDocument response once. Returns None if missing or malformed."""
+    if tei is None:
+        return None
+    if settings.DEBUG_DUMP_FULLTEXT:
+        with open("full_text_grobid.txt", "w", encoding="utf-8") as f:
+            f.write(tei + "\n")
+            f.write("=====================================\n")
+    try:
+        return etree.fromstring(tei.encode("utf-8"))
+    except Exception as e:
+        logger.warning("GROBID TEI parse error: %s", e)
+        return None
+
+
+def _extract_from_tei(tei: Optional[str], extractor: Callable, default: Any) -> Any:
+    """Parse TEI and run one extractor on it, or return default if there is nothing to parse."""
+    root = _parse_tei(tei)
+    return extractor(root) if root is not None else default
+
+
+def _parse_fulltext_document(tei: Optional[str]) -> Tuple[str, List[str], List[Dict[str, Any]]]:
+    """Fulltext, reference titles and structured sections from a single TEI parse."""
+    root = _parse_tei(tei)
+    if root is None:
+        return "", [], []
+    return _fulltext_from_root(root), _references_from_root(root), _structured_from_root(root)
+
+
+async def extract_fulltext_async(file_bytes: bytes) -> str:
+    """
+    Extract full text from PDF using GROBID processFulltextDocument endpoint.
+    Returns plain text content.
+    """
+    tei = await _fetch_fulltext_tei_async(file_bytes)
+    # TEI parsing is CPU-bound; keep it off the event loop
+    return await asyncio.to_thread(_extract_from_tei, tei, _fulltext_from_root, "")
+
+
+async def extract_fulltext_document_async(
+    file_bytes: bytes
+) -> Tuple[str, List[str], List[Dict[str, Any]]]:
+    """
+    Extract full text, reference titles and structured sections (see
+    _structured_from_root) with one processFulltextDocument request and a
+    single parse of the returned TEI.
+    """
+    tei = await _fetch_fulltext_tei_async(file_bytes)
+    return await asyncio.to_thread(_parse_fulltext_document, tei)
+
+
+def _fulltext_from_root(root) -> str:
+    """Build plain text (header + body) from a parsed processFulltextDocument TEI tree."""
     try:
-        root = etree.fromstring(response.text.encode("utf-8"))
-        ns = {"tei": "http://www.tei-c.org/ns/1.0"}
-        
         parts = []
         
         # 1. Extract header content (title page / page 1)
         # Title - try multiple XPath locations (same as extract_header)
-        title_xpaths = [
-            "//tei:titleStmt/tei:title[@type='main']",
-            "//tei:titleStmt/tei:title[not(@type)]",
-            "//tei:titleStmt/tei:title",
-            "//tei:sourceDesc//tei:title[@level='a']",
-            "//tei:analytic/tei:title",
-        ]
-        title_text = None
-        for xpath in title_xpaths:
-            title_nodes = root.xpath(xpath, namespaces=ns)
-            for node in title_nodes:
-                # Use itertext() to get ALL text including nested elements
-                text = "".join(node.itertext()).strip()
-                if text and len(text) > 3:
-                    title_text = text
-                    break
-            if title_text:
-                break
+        title_nodes = _XP_TITLE(root)
+        # itertext() gets ALL text including nested elements
+        title_text = "".join(title_nodes[0].itertext()).strip() if title_nodes else None
         
         if title_text:
             parts.append(title_text)
-            print(f"GROBID fulltext: Title included: {title_text[:80]}")
+            logger.debug("GROBID fulltext: Title included: %.80s", title_text)
         else:
-            print("GROBID fulltext: WARNING - No title found in fulltext XML")
+            logger.warning("GROBID fulltext: No title found in fulltext XML")
         
         # Authors
-        authors_xml = root.xpath("//tei:author/tei:persName", namespaces=ns)
+        authors_xml = _XP_AUTHORS(root)
         author_names = []
         for author in authors_xml:
-            forename = "".join(author.xpath("tei:forename/text()", namespaces=ns)) or ""
-            surname = "".join(author.xpath("tei:surname/text()", namespaces=ns)) or ""
+            forename = "".join(_XP_FORENAME(author)) or ""
+            surname = "".join(_XP_SURNAME(author)) or ""
             full_name = f"{forename} {surname}".strip()
             if full_name:
                 author_names.append(full_name)
@@ -220,68 +319,61 @@ def extract_fulltext(file_bytes: bytes) -> str:
             parts.append("Authors: " + ", ".join(author_names))
         
         # Publisher / Journal
-        publisher_nodes = root.xpath("//tei:publicationStmt/tei:publisher/text()", namespaces=ns)
-        journal_nodes = root.xpath("//tei:sourceDesc//tei:title[@level='j']/text()", namespaces=ns)
+        publisher_nodes = _XP_PUBLISHER(root)
+        journal_nodes = _XP_JOURNAL(root)
         if publisher_nodes and publisher_nodes[0].strip():
             parts.append("Publisher: " + publisher_nodes[0].strip())
         if journal_nodes and journal_nodes[0].strip():
             parts.append("Journal: " + journal_nodes[0].strip())
         
         # Abstract
-        abstract_nodes = root.xpath("//tei:profileDesc/tei:abstract//text()", namespaces=ns)
+        abstract_nodes = _XP_ABSTRACT_TEXT(root)
         if abstract_nodes:
             abstract_text = " ".join(t.strip() for t in abstract_nodes if t.strip())
             if abstract_text:
                 parts.append("Abstract: " + abstract_text)
         
         # Keywords
-        keyword_nodes = root.xpath("//tei:keywords//tei:term/text()", namespaces=ns)
+        keyword_nodes = _XP_KEYWORDS(root)
         if keyword_nodes:
             parts.append("Keywords: " + ", ".join(k.strip() for k in keyword_nodes if k.strip()))
         
         # 2. Extract body content (paragraphs + section headings)
-        body_elements = root.xpath("//tei:body//tei:head | //tei:body//tei:p", namespaces=ns)
+        body_elements = _XP_BODY_BLOCKS(root)
         for elem in body_elements:
             text = "".join(elem.itertext()).strip()
             if text:
                 parts.append(text)
 
         fulltext = "\n\n".join(parts)
-        with open("fullbgtt.txt", "w", encoding="utf-8") as f:
-            f.write(fulltext + "\n")
-            f.write("=====================================\n")
+        if settings.DEBUG_DUMP_FULLTEXT:
+            with open("fullbgtt.txt", "w", encoding="utf-8") as f:
+                f.write(fulltext + "\n")
+                f.write("=====================================\n")
 
-        print(f"GROBID fulltext: {len(fulltext)} chars (header + body)")
+        logger.debug("GROBID fulltext: %d chars (header + body)", len(fulltext))
         return fulltext
     except Exception as e:
-        print(f"GROBID fulltext extraction error: {e}")
+        logger.warning("GROBID fulltext extraction error: %s", e)
         return ""
 
 
-def extract_references(file_bytes: bytes) -> list[str]:
+async def extract_references_async(file_bytes: bytes) -> list[str]:
     """
     Extract reference titles from PDF using GROBID.
     Returns list of reference titles.
     """
-    url = f"{settings.GROBID_URL}/api/processFulltextDocument"
-    
     try:
-        response = requests.post(
-            url,
-            files={'input': ("document.pdf", file_bytes)},
-            headers={'Accept': 'application/xml'},
-            timeout=60
-        )
+        tei = await _fetch_fulltext_tei_async(file_bytes)
     except Exception:
         return []
-    
-    if response.status_code != 200:
-        return []
-    
+    return await asyncio.to_thread(_extract_from_tei, tei, _references_from_root, [])
+
+
+def _references_from_root(root) -> list[str]:
+    """Reference titles from a parsed processFulltextDocument TEI tree."""
     try:
-        root = etree.fromstring(response.text.encode("utf-8"))
-        ns = {"tei": "http://www.tei-c.org/ns/1.0"}
-        return root.xpath("//tei:listBibl//tei:title/text()", namespaces=ns)
+        return _XP_REFERENCE_TITLES(root)
     except Exception:
         return []
 
@@ -340,10 +432,11 @@ def format_for_database(metadata: dict, references: list[str] = None) -> dict:
     }
 
 
-def extract_structured_fulltext(file_bytes: bytes) -> List[Dict[str, Any]]:
+def _structured_from_root(root) -> List[Dict[str, Any]]:
     """
-    Extract structured full text from PDF using GROBID.
-    Returns a list of structured sections preserving document structure.
+    Structured sections from a parsed processFulltextDocument TEI tree
+    (see extract_fulltext_document_async),
+    preserving document structure.
     
     Each section dict has:
         - type: "title" | "authors" | "abstract" | "keywords" | "section" | "reference"
@@ -353,52 +446,13 @@ def extract_structured_fulltext(file_bytes: bytes) -> List[Dict[str, Any]]:
     
     This preserves ALL text from the document for smart chunking.
     """
-    url = f"{settings.GROBID_URL}/api/processFulltextDocument"
-    
-    try:
-        response = requests.post(
-            url,
-            files={'input': ("document.pdf", file_bytes)},
-            headers={'Accept': 'application/xml'},
-            timeout=120
-        )
-    except requests.exceptions.ConnectionError:
-        raise HTTPException(
-            status_code=503,
-            detail="GROBID service is not available."
-        )
-    except requests.exceptions.Timeout:
-        raise HTTPException(
-            status_code=504,
-            detail="GROBID fulltext extraction timed out."
-        )
-    
-    if response.status_code != 200:
-        return []
-    
     try:
-        root = etree.fromstring(response.text.encode("utf-8"))
-        ns = {"tei": "http://www.tei-c.org/ns/1.0"}
         sections = []
         
         # === 1. TITLE ===
-        title_xpaths = [
-            "//tei:titleStmt/tei:title[@type='main']",
-            "//tei:titleStmt/tei:title[not(@type)]",
-            "//tei:titleStmt/tei:title",
-            "//tei:sourceDesc//tei:title[@level='a']",
-            "//tei:analytic/tei:title",
-        ]
-        title_text = None
-        for xpath in title_xpaths:
-            title_nodes = root.xpath(xpath, namespaces=ns)
-            for node in title_nodes:
-                text = "".join(node.itertext()).strip()
-                if text and len(text) > 3:
-                    title_text = text
-                    break
-            if title_text:
-                break
+        title_nodes = _XP_TITLE(root)
+        # itertext() gets ALL text including nested elements
+        title_text = "".join(title_nodes[0].itertext()).strip() if title_nodes else None
         
         if title_text:
             sections.append({
@@ -409,11 +463,11 @@ def extract_structured_fulltext(file_bytes: bytes) -> List[Dict[str, Any]]:
             })
         
         # === 2. AUTHORS ===
-        authors_xml = root.xpath("//tei:author/tei:persName", namespaces=ns)
+        authors_xml = _XP_AUTHORS(root)
         author_names = []
         for author in authors_xml:
-            forename = "".join(author.xpath("tei:forename/text()", namespaces=ns)) or ""
-            surname = "".join(author.xpath("tei:surname/text()", namespaces=ns)) or ""
+            forename = "".join(_XP_FORENAME(author)) or ""
+            surname = "".join(_XP_SURNAME(author)) or ""
             full_name = f"{forename} {surname}".strip()
             if full_name:
                 author_names.append(full_name)
@@ -427,8 +481,8 @@ def extract_structured_fulltext(file_bytes: bytes) -> List[Dict[str, Any]]:
             })
         
         # === 3. PUBLISHER / JOURNAL ===
-        publisher_nodes = root.xpath("//tei:publicationStmt/tei:publisher/text()", namespaces=ns)
-        journal_nodes = root.xpath("//tei:sourceDesc//tei:title[@level='j']/text()", namespaces=ns)
+        publisher_nodes = _XP_PUBLISHER(root)
+        journal_nodes = _XP_JOURNAL(root)
         pub_parts = []
         if publisher_nodes and publisher_nodes[0].strip():
             pub_parts.append("Publisher: " + publisher_nodes[0].strip())
@@ -444,7 +498,7 @@ def extract_structured_fulltext(file_bytes: bytes) -> List[Dict[str, Any]]:
             })
         
         # === 4. ABSTRACT ===
-        abstract_nodes = root.xpath("//tei:profileDesc/tei:abstract//text()", namespaces=ns)
+        abstract_nodes = _XP_ABSTRACT_TEXT(root)
         if abstract_nodes:
             abstract_text = " ".join(t.strip() for t in abstract_nodes if t.strip())
             if abstract_text:
@@ -456,7 +510,7 @@ def extract_structured_fulltext(file_bytes: bytes) -> List[Dict[str, Any]]:
                 })
         
         # === 5. KEYWORDS ===
-        keyword_nodes = root.xpath("//tei:keywords//tei:term/text()", namespaces=ns)
+        keyword_nodes = _XP_KEYWORDS(root)
         if keyword_nodes:
             keywords_text = "Keywords: " + ", ".join(k.strip() for k in keyword_nodes if k.strip())
             sections.append({
@@ -467,36 +521,36 @@ def extract_structured_fulltext(file_bytes: bytes) -> List[Dict[str, Any]]:
             })
         
         # === 6. BODY SECTIONS (structured by <div> with <head>) ===
-        body = root.xpath("//tei:body", namespaces=ns)
+        body = _XP_BODY(root)
         if body:
             body_elem = body[0]
             # Get top-level divs (sections)
-            divs = body_elem.xpath("tei:div", namespaces=ns)
+            divs = _XP_DIV(body_elem)
             
             if divs:
                 for div in divs:
                     # Get section heading
-                    head_nodes = div.xpath("tei:head", namespaces=ns)
+                    head_nodes = _XP_HEAD(div)
                     section_title = None
                     if head_nodes:
                         section_title = "".join(head_nodes[0].itertext()).strip()
                     
                     # Get all paragraphs in this section
                     paragraphs = []
-                    for p in div.xpath("tei:p", namespaces=ns):
+                    for p in _XP_P(div):
                         text = "".join(p.itertext()).strip()
                         if text:
                             paragraphs.append(text)
                     
                     # Also check for nested divs (subsections)
-                    for sub_div in div.xpath("tei:div", namespaces=ns):
-                        sub_head_nodes = sub_div.xpath("tei:head", namespaces=ns)
+                    for sub_div in _XP_DIV(div):
+                        sub_head_nodes = _XP_HEAD(sub_div)
                         sub_title = None
                         if sub_head_nodes:
                             sub_title = "".join(sub_head_nodes[0].itertext()).strip()
                         
                         sub_paragraphs = []
-                        for p in sub_div.xpath("tei:p", namespaces=ns):
+                        for p in _XP_P(sub_div):
                             text = "".join(p.itertext()).strip()
                             if text:
                                 sub_paragraphs.append(text)
@@ -532,7 +586,7 @@ def extract_structured_fulltext(file_bytes: bytes) -> List[Dict[str, Any]]:
                 # No divs — fallback: get all paragraphs and headings directly
                 paragraphs = []
                 current_heading = None
-                for elem in body_elem.xpath("tei:head | tei:p", namespaces=ns):
+                for elem in _XP_HEAD_OR_P(body_elem):
                     tag = etree.QName(elem.tag).localname
                     text = "".join(elem.itertext()).strip()
                     if not text:
@@ -554,29 +608,29 @@ def extract_structured_fulltext(file_bytes: bytes) -> List[Dict[str, Any]]:
                     })
         
         # === 7. REFERENCES ===
-        ref_titles = root.xpath("//tei:listBibl//tei:biblStruct", namespaces=ns)
+        ref_titles = _XP_BIBL_STRUCTS(root)
         if ref_titles:
             ref_texts = []
             for i, bib in enumerate(ref_titles):
                 # Get the full text of each reference
                 ref_parts = []
                 # Authors
-                ref_authors = bib.xpath(".//tei:author/tei:persName", namespaces=ns)
+                ref_authors = _XP_BIBL_AUTHORS(bib)
                 author_strs = []
                 for a in ref_authors:
-                    fn = "".join(a.xpath("tei:forename/text()", namespaces=ns)) or ""
-                    sn = "".join(a.xpath("tei:surname/text()", namespaces=ns)) or ""
+                    fn = "".join(_XP_FORENAME(a)) or ""
+                    sn = "".join(_XP_SURNAME(a)) or ""
                     name = f"{fn} {sn}".strip()
                     if name:
                         author_strs.append(name)
                 if author_strs:
                     ref_parts.append(", ".join(author_strs))
                 # Title
-                ref_title = bib.xpath(".//tei:title/text()", namespaces=ns)
+                ref_title = _XP_BIBL_TITLE(bib)
                 if ref_title:
                     ref_parts.append(ref_title[0].strip())
                 # Date
-                ref_date = bib.xpath(".//tei:date/@when", namespaces=ns)
+                ref_date = _XP_BIBL_DATE(bib)
                 if ref_date:
                     ref_parts.append(f"({ref_date[0]})")
                 
@@ -592,13 +646,17 @@ def extract_structured_fulltext(file_bytes: bytes) -> List[Dict[str, Any]]:
                     "paragraphs": ref_texts
                 })
         
-        total_chars = sum(len(s.get("content", "")) for s in sections)
-        print(f"GROBID structured: {len(sections)} sections, {total_chars} total chars")
-        for s in sections:
-            print(f"  [{s['type']}] {s.get('title', 'N/A')}: {len(s.get('paragraphs', []))} paragraphs, {len(s.get('content', ''))} chars")
+        if logger.isEnabledFor(logging.DEBUG):
+            total_chars = sum(len(s.get("content", "")) for s in sections)
+            logger.debug("GROBID structured: %d sections, %d total chars", len(sections), total_chars)
+            for s in sections:
+                logger.debug(
+                    "  [%s] %s: %d paragraphs, %d chars",
+                    s['type'], s.get('title', 'N/A'), len(s.get('paragraphs', [])), len(s.get('content', ''))
+                )
         
         return sections
         
     except Exception as e:
-        print(f"GROBID structured fulltext extraction error: {e}")
+        logger.warning("GROBID structured fulltext extraction error: %s", e)
         return []
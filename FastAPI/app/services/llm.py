@@ -1,6 +1,7 @@
 import httpx
 import google.generativeai as genai
 from app.config import get_settings
+from app.services.gemini import configure_gemini
 
 settings = get_settings()
 
@@ -44,12 +45,10 @@ async def generate_response_test(prompt: str) -> str:
     """
     Generate a response from the LLM using Google Gemini.
     """
-    api_key = settings.GOOGLE_API_KEY or settings.GEMINI_API_KEY
-    if not api_key:
+    if not configure_gemini():
         return "Error: Google/Gemini API key not configured."
 
     try:
-        genai.configure(api_key=api_key)
         model = genai.GenerativeModel(settings.GOOGLE_GENERATION_MODEL)
         
         response = await model.generate_content_async(prompt)
@@ -1,4 +1,8 @@
+import os
 import uuid
+from functools import lru_cache
+import certifi
+import urllib3
 from minio import Minio
 from minio.error import S3Error
 from fastapi import UploadFile, HTTPException
@@ -11,13 +15,30 @@ ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "webp"}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 
 
+@lru_cache()
 def get_minio_client() -> Minio:
-    """Get MinIO client instance."""
+    """
+    Get shared MinIO client instance.
+    Uses a larger connection pool than the SDK default (10) so parallel
+    multipart uploads and concurrent requests reuse connections.
+    """
+    http_client = urllib3.PoolManager(
+        timeout=urllib3.Timeout(connect=300, read=300),
+        maxsize=settings.MINIO_MAX_CONNECTIONS,
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=urllib3.Retry(
+            total=5,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504]
+        )
+    )
     return Minio(
         settings.MINIO_ENDPOINT,
         access_key=settings.MINIO_ACCESS_KEY,
         secret_key=settings.MINIO_SECRET_KEY,
-        secure=settings.MINIO_SECURE
+        secure=settings.MINIO_SECURE,
+        http_client=http_client
     )
 
 
@@ -1,4 +1,5 @@
 from typing import Dict, List
+import orjson
 from fastapi import WebSocket
 
 class ConnectionManager:
@@ -19,10 +20,12 @@ class ConnectionManager:
 
     async def send_personal_message(self, message: dict, client_id: str):
         if client_id in self.active_connections:
-            await self.active_connections[client_id].send_json(message)
+            # Same text frame as send_json(), serialized with orjson
+            await self.active_connections[client_id].send_text(orjson.dumps(message).decode())
 
     async def broadcast(self, message: dict):
+        payload = orjson.dumps(message).decode()  # Serialized once for all clients
         for connection in self.active_connections.values():
-            await connection.send_json(message)
+            await connection.send_text(payload)
 
 manager = ConnectionManager()